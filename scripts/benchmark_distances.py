@@ -0,0 +1,116 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Checks that the batched distance kernels of util give the same tower-to-tower distances as the scalar
+compute_length_ground on the paths of all network.txt files, and compares the time both take
+"""
+
+import os
+import time
+import numpy as np
+
+try:
+    from . import util
+    from . import license_data
+except (ImportError, SystemError):
+    import util
+    import license_data
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Number of timed passes over all paths
+REPEAT = 3
+
+
+def load_paths():
+    """
+    Loads the towers of all paths of the network.txt files under OUTPUT_DIR
+    :return: Lists of transmitter and receiver towers
+    """
+    transmitters = []
+    receivers = []
+    for dirpath, dirnames, filenames in sorted(os.walk(OUTPUT_DIR)):
+        if "network.txt" not in filenames:
+            continue
+        network = license_data.load_network(os.path.join(dirpath, "network.txt"))
+        transmitters.extend(network.towers[i] for i in network.transmitter)
+        receivers.extend(network.towers[i] for i in network.receiver)
+    return transmitters, receivers
+
+
+def compute_lengths_scalar(transmitters, receivers):
+    """
+    Computes the path lengths one path at a time
+    :param transmitters: Transmitter towers
+    :param receivers: Receiver towers
+    :return: Array of lengths in km
+    """
+    return np.array([util.compute_length_ground(t, r) for t, r in zip(transmitters, receivers)])
+
+
+def compute_lengths_batched(transmitters, receivers):
+    """
+    Computes the path lengths of all paths at once, including the conversion to Earth-centered coordinates
+    :param transmitters: Transmitter towers
+    :param receivers: Receiver towers
+    :return: Array of lengths in km
+    """
+    xyz1 = util.compute_ecef([t.lat_rad for t in transmitters], [t.long_rad for t in transmitters])
+    xyz2 = util.compute_ecef([r.lat_rad for r in receivers], [r.long_rad for r in receivers])
+    return util.compute_lengths_ground(xyz1, xyz2)
+
+
+def benchmark(function, transmitters, receivers):
+    """
+    Times a length computation over all paths
+    :param function: Function of the transmitter and receiver towers
+    :param transmitters: Transmitter towers
+    :param receivers: Receiver towers
+    :return: Best time (in seconds) of REPEAT passes
+    """
+    best = None
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        function(transmitters, receivers)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+if __name__ == "__main__":
+    transmitters, receivers = load_paths()
+    print("Paths", len(transmitters))
+    if transmitters:
+        expected = compute_lengths_scalar(transmitters, receivers)
+        actual = compute_lengths_batched(transmitters, receivers)
+        print("Max difference (km)", np.abs(expected - actual).max())
+        great_circle = util.compute_lengths_great_circle([t.lat_rad for t in transmitters],
+                                                         [t.long_rad for t in transmitters],
+                                                         [r.lat_rad for r in receivers],
+                                                         [r.long_rad for r in receivers])
+        print("Max great-circle minus chord (km)", (great_circle - actual).max())
+        time_scalar = benchmark(compute_lengths_scalar, transmitters, receivers)
+        time_batched = benchmark(compute_lengths_batched, transmitters, receivers)
+        print("scalar", time_scalar, "s", "batched", time_batched, "s", "speedup", time_scalar / time_batched)
@@ -0,0 +1,124 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Checks that the single-pass lxml parser of path details pages gives the same results as the
+BeautifulSoup parser on saved pages, and compares the time both take to parse them
+"""
+
+import json
+import os
+import sys
+import time
+
+try:
+    from . import fcc_parser
+except (ImportError, SystemError):
+    import fcc_parser
+
+# Saved path details pages: the committed fixtures (regular pages and edge cases such as truncated or
+# malformed pages), the HTTP response cache (http_util.CACHE_DIR), or any directory of .html files
+PAGES_DIR = "../fcc_fixtures/path_details/"
+
+# Number of timed passes over all pages
+REPEAT = 3
+
+
+def load_pages():
+    """
+    Loads saved path details pages
+    :return: List of (name, page text) pairs
+    """
+    pages = []
+    for dirpath, dirnames, filenames in os.walk(PAGES_DIR):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if filename.endswith(".html"):
+                with open(path, 'r', encoding='utf-8') as f:
+                    pages.append((path, f.read()))
+            elif filename.endswith(".json"):
+                with open(path, 'r') as f:
+                    url = json.load(f)["url"]
+                if url.find("licensePathsDetail") != -1:
+                    with open(path[:-len(".json")], 'r', encoding='utf-8') as f:
+                        pages.append((url, f.read()))
+    return pages
+
+
+def parse(parser, text):
+    """
+    Parses a page, turning a parse error into a result so that both parsers can be compared on broken pages
+    :param parser: Parser function
+    :param text: Page text
+    :return: Transmitter, receiver and frequency list, or ('error', exception type)
+    """
+    try:
+        return parser(text)
+    except Exception as e:
+        return 'error', type(e)
+
+
+def check_parity(pages):
+    """
+    Compares the results of both parsers on every page
+    :param pages: List of (name, page text) pairs
+    :return: Number of pages on which the parsers disagree
+    """
+    mismatches = 0
+    for name, text in pages:
+        expected = parse(fcc_parser.parse_path_detail_bs4, text)
+        actual = parse(fcc_parser.parse_path_detail, text)
+        if expected != actual:
+            mismatches += 1
+            print("Mismatch", name, expected, actual)
+    return mismatches
+
+
+def benchmark(parser, pages):
+    """
+    Times a parser over all pages
+    :param parser: Parser function
+    :param pages: List of (name, page text) pairs
+    :return: Best time (in seconds) of REPEAT passes
+    """
+    best = None
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        for name, text in pages:
+            parse(parser, text)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+if __name__ == "__main__":
+    pages = load_pages()
+    print("Pages", len(pages))
+    if pages:
+        mismatches = check_parity(pages)
+        print("Mismatches", mismatches)
+        time_bs4 = benchmark(fcc_parser.parse_path_detail_bs4, pages)
+        time_lxml = benchmark(fcc_parser.parse_path_detail, pages)
+        print("bs4", time_bs4, "s", "lxml", time_lxml, "s", "speedup", time_bs4 / time_lxml)
+        if mismatches:
+            sys.exit(1)
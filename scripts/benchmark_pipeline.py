@@ -0,0 +1,246 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Times the stages of the pipeline on the committed data under OUTPUT_DIR and on saved path details pages:
+path details parsing, license validity + network reconstruction on RECONSTRUST_DATES, YAML and binary
+snapshot dump/load, and the latency computation of get_e2e_latency, per entity. Wall time (best of REPEAT
+passes) and peak traced memory (one pass under tracemalloc) of each stage are compared against the
+baseline in BASELINE_FILE, and stages slower or bigger than REGRESSION_THRESHOLD times the baseline are reported.
+Nothing is written under OUTPUT_DIR but the baseline
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import networkx as nx
+
+try:
+    from . import benchmark_path_parser
+    from . import fcc_parser
+    from . import get_e2e_latency
+    from . import graph_snapshot
+    from . import license_data
+    from . import reconstruct_by_date
+except (ImportError, SystemError):
+    import benchmark_path_parser
+    import fcc_parser
+    import get_e2e_latency
+    import graph_snapshot
+    import license_data
+    import reconstruct_by_date
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Saved path details pages (see benchmark_path_parser)
+PAGES_DIR = benchmark_path_parser.PAGES_DIR
+
+# Baseline results; written by the first run, or whenever UPDATE_BASELINE is True
+BASELINE_FILE = OUTPUT_DIR + "00_benchmark/baseline.json"
+UPDATE_BASELINE = False
+
+# Number of timed passes of each stage
+REPEAT = 5
+
+# A stage regressed if its time or peak memory exceeds the baseline by this factor,
+# and by more than the minimum difference (below which differences are mostly noise)
+REGRESSION_THRESHOLD = 1.25
+REGRESSION_MIN_DIFFERENCE = {"time": 0.01, "peak_memory": 1 << 20}
+
+# Entities which operate in the Chicago-NJ corridor
+ENTITY_NAMES = license_data.ENTITY_NAMES
+
+
+def measure(function):
+    """
+    Measures a stage
+    :param function: Function without arguments running the stage
+    :return: Dictionary with the best time (s) of REPEAT passes and the peak traced memory (bytes) of one pass
+    """
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = None
+    for i in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"time": best, "peak_memory": peak_memory}
+
+
+def parse_pages(pages):
+    """
+    Parses path details pages
+    :param pages: List of (name, page text) pairs
+    :return: None
+    """
+    for name, text in pages:
+        benchmark_path_parser.parse(fcc_parser.parse_path_detail, text)
+
+
+def reconstruct(corr_name):
+    """
+    Finds the valid licenses and reconstructs the network of an entity on every date of RECONSTRUST_DATES,
+    parsing the license and network files again
+    :param corr_name: Entity name
+    :return: Graph on the last date
+    """
+    license_data.clear_cache()
+    reconstruct_by_date.license_file = OUTPUT_DIR + corr_name + "/2020_04/license_status_dates.txt"
+    reconstruct_by_date.network_file = OUTPUT_DIR + corr_name + "/2020_04/network.txt"
+    valid_licenses_by_date = reconstruct_by_date.find_valid_licenses(reconstruct_by_date.RECONSTRUST_DATES)
+    for date in reconstruct_by_date.RECONSTRUST_DATES:
+        reconstruct_by_date.G = nx.DiGraph()
+        reconstruct_by_date.valid_licenses = valid_licenses_by_date[date]
+        reconstruct_by_date.nodes = {}
+        reconstruct_by_date.nodes_by_id = {}
+        reconstruct_by_date.global_node_counter = 0
+        reconstruct_by_date.edges = {}
+        reconstruct_by_date.reconstruct_network()
+    return reconstruct_by_date.G
+
+
+def reconstruct_incremental(corr_name):
+    """
+    Evolves the network of an entity through RECONSTRUST_DATES, parsing the license and network files again
+    :param corr_name: Entity name
+    :return: None
+    """
+    license_data.clear_cache()
+    reconstruct_by_date.license_file = OUTPUT_DIR + corr_name + "/2020_04/license_status_dates.txt"
+    reconstruct_by_date.network_file = OUTPUT_DIR + corr_name + "/2020_04/network.txt"
+    for date, grph in reconstruct_by_date.iter_graphs(reconstruct_by_date.RECONSTRUST_DATES):
+        pass
+
+
+def dump_load_yaml(grph, directory):
+    """
+    Writes a graph as YAML and reads it back
+    :param grph: Directed graph
+    :param directory: Directory of the YAML file
+    :return: None
+    """
+    path = os.path.join(directory, graph_snapshot.YAML_FILE)
+    graph_snapshot.write_yaml_graph(grph, path)
+    graph_snapshot.read_yaml_graph(path)
+
+
+def dump_load_snapshot(grph, directory):
+    """
+    Writes a graph as binary snapshot and reads it back
+    :param grph: Directed graph
+    :param directory: Directory of the snapshot file
+    :return: None
+    """
+    path = os.path.join(directory, graph_snapshot.SNAPSHOT_FILE)
+    graph_snapshot.write_snapshot(grph, path)
+    graph_snapshot.read_snapshot(path).to_graph()
+
+
+def benchmark_entity(corr_name, directory):
+    """
+    Measures the stages of an entity
+    :param corr_name: Entity name
+    :param directory: Scratch directory for written files
+    :return: Dictionary of stage -> measurement
+    """
+    results = {}
+    results["reconstruct"] = measure(lambda: reconstruct(corr_name))
+    results["reconstruct_incremental"] = measure(lambda: reconstruct_incremental(corr_name))
+    # The network on the last date is dumped and used for the latency computation
+    grph = reconstruct(corr_name)
+    results["yaml_dump_load"] = measure(lambda: dump_load_yaml(grph, directory))
+    results["snapshot_dump_load"] = measure(lambda: dump_load_snapshot(grph, directory))
+    # find_inter_DC_min_lat writes the link files of the paths to the scratch directory
+    get_e2e_latency.OUTPUT_DIR = directory + "/"
+    os.makedirs(os.path.join(directory, corr_name, get_e2e_latency.SNAPSHOT_DATE), exist_ok=True)
+    results["latency"] = measure(lambda: get_e2e_latency.find_inter_DC_min_lat(grph, corr_name))
+    return results
+
+
+def run_benchmarks():
+    """
+    Measures all stages
+    :return: Dictionary of entity name (or 'path_detail' for the page parser) -> stage -> measurement
+    """
+    results = {}
+    pages = benchmark_path_parser.load_pages()
+    print("Pages", len(pages))
+    if pages:
+        results["path_detail"] = {"parse": measure(lambda: parse_pages(pages))}
+    with tempfile.TemporaryDirectory() as directory:
+        for entity in ENTITY_NAMES:
+            corr_name = license_data.get_corr_name(entity)
+            if not os.path.exists(OUTPUT_DIR + corr_name + "/2020_04/network.txt"):
+                print("No network", corr_name)
+                continue
+            results[corr_name] = benchmark_entity(corr_name, directory)
+            for stage in results[corr_name]:
+                print(corr_name, stage, "%.4f s" % results[corr_name][stage]["time"],
+                      results[corr_name][stage]["peak_memory"], "B")
+    return results
+
+
+def compare(results, baseline):
+    """
+    Compares results against a baseline
+    :param results: Dictionary of name -> stage -> measurement
+    :param baseline: Baseline in the same format
+    :return: List of (name, stage, metric, baseline value, value) of regressions
+    """
+    regressions = []
+    for name in results:
+        for stage in results[name]:
+            if stage not in baseline.get(name, {}):
+                continue
+            for metric in ("time", "peak_memory"):
+                value = results[name][stage][metric]
+                baseline_value = baseline[name][stage][metric]
+                if (value > REGRESSION_THRESHOLD * baseline_value
+                        and value - baseline_value > REGRESSION_MIN_DIFFERENCE[metric]):
+                    regressions.append((name, stage, metric, baseline_value, value))
+    return regressions
+
+
+if __name__ == "__main__":
+    results = run_benchmarks()
+    for stage in ("reconstruct", "reconstruct_incremental", "yaml_dump_load", "snapshot_dump_load", "latency"):
+        print("Total", stage, "%.4f s" % sum(results[name][stage]["time"] for name in results
+                                              if stage in results[name]))
+    if os.path.exists(BASELINE_FILE) and not UPDATE_BASELINE:
+        with open(BASELINE_FILE, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline)
+        for name, stage, metric, baseline_value, value in regressions:
+            print("Regression", name, stage, metric, baseline_value, "->", value)
+        print("Regressions", len(regressions))
+    else:
+        os.makedirs(os.path.dirname(BASELINE_FILE), exist_ok=True)
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Baseline written", BASELINE_FILE)
@@ -0,0 +1,233 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Builds a corridor-wide graph combining the networks of all entities on a date. Towers of different
+entities (e.g. towers leased from tower companies) within TOWER_MERGE_RADIUS of each other are merged
+into one node, every link keeps the entities which operate it, and latencies between the data centers
+are computed over the combined network
+"""
+
+import math
+import os
+import networkx as nx
+import numpy as np
+
+try:
+    from . import util
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
+except (ImportError, SystemError):
+    import util
+    import graph_snapshot
+    import latency
+    import license_data
+
+# Date of the combined network; Format: mm_dd_yyyy
+SNAPSHOT_DATE = "04_01_2020"
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Output directory of the combined graph and its latencies
+CORRIDOR_DIR = OUTPUT_DIR + "00_corridor/" + SNAPSHOT_DATE + "/"
+
+# Towers within this distance (km) of each other are the same tower
+TOWER_MERGE_RADIUS = 0.05
+
+# Exchanges (names in latency.DATA_CENTERS) whose latencies from CME are computed
+EXCHANGES = ["ny4", "nyse", "nasdaq"]
+
+# Data centers DC[0] is CME CyrusOne, DC[1], DC[2], ... are the exchanges
+DC = latency.get_data_centers(["cme"] + EXCHANGES)
+
+# Entities which operate in the Chicago-NJ corridor
+ENTITY_NAMES = license_data.ENTITY_NAMES
+
+
+class TowerIndex:
+    """
+    Deduplicates towers by hashing their Earth-centered coordinates into a grid of cubes of side
+    TOWER_MERGE_RADIUS; a tower only needs to be compared with the towers in the 27 cubes around it
+    """
+
+    def __init__(self, radius=TOWER_MERGE_RADIUS):
+        self.radius = radius
+        self.cells = {}
+        self.towers = []
+
+    def find_or_add(self, xyz):
+        """
+        Finds the first added tower within the merge radius of a location, or adds a tower there
+        :param xyz: Earth-centered coordinates (km) of the location (see util.compute_ecef)
+        :return: Tower ID, and whether the tower was added
+        """
+        cell = tuple(np.floor(xyz / self.radius).astype(int).tolist())
+        best_id = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    for tower_id in self.cells.get((cell[0] + dx, cell[1] + dy, cell[2] + dz), []):
+                        if best_id is not None and tower_id > best_id:
+                            continue
+                        if np.sqrt(((self.towers[tower_id] - xyz) ** 2).sum()) <= self.radius:
+                            best_id = tower_id
+        if best_id is not None:
+            return best_id, False
+        self.cells.setdefault(cell, []).append(len(self.towers))
+        self.towers.append(xyz)
+        return len(self.towers) - 1, True
+
+
+def build_corridor_graph(entity_graphs, radius=TOWER_MERGE_RADIUS):
+    """
+    Combines the networks of several entities into one graph. A tower is merged into the first added
+    tower within the radius, whose coordinates and elevation it takes; links whose towers are merged
+    into one are dropped. Link lengths are recomputed between the merged towers, frequency lists are
+    concatenated and the 'owners' edge attribute lists the entities operating each link
+    :param entity_graphs: List of (entity name, directed graph)
+    :param radius: Merge radius (km)
+    :return: Directed graph; node IDs are tower IDs in order of first appearance
+    """
+    index = TowerIndex(radius)
+    grph = nx.DiGraph()
+    edges = []
+    for corr_name, entity_graph in entity_graphs:
+        nodes = list(entity_graph.nodes(data=True))
+        lat_deg = np.array([float(data['lat_deg']) for u, data in nodes])
+        long_deg = np.array([float(data['long_deg']) for u, data in nodes])
+        xyz = util.compute_ecef(np.radians(lat_deg), np.radians(long_deg))
+        tower_ids = {}
+        for i, (u, data) in enumerate(nodes):
+            tower_ids[u], added = index.find_or_add(xyz[i])
+            if added:
+                grph.add_node(tower_ids[u],
+                              lat_deg=float(lat_deg[i]),
+                              lat_rad=math.radians(lat_deg[i]),
+                              long_deg=float(long_deg[i]),
+                              long_rad=math.radians(long_deg[i]),
+                              elevation=data['elevation'])
+        for u, v, data in entity_graph.edges(data=True):
+            u2 = tower_ids[u]
+            v2 = tower_ids[v]
+            if u2 == v2:
+                continue
+            if grph.has_edge(u2, v2):
+                grph[u2][v2]['frequency_list'].extend(data['frequency_list'])
+                if corr_name not in grph[u2][v2]['owners']:
+                    grph[u2][v2]['owners'].append(corr_name)
+            else:
+                grph.add_edge(u2, v2,
+                              frequency_list=list(data['frequency_list']),
+                              owners=[corr_name])
+                edges.append((u2, v2))
+    if edges:
+        tower_xyz = np.array(index.towers)
+        ends = np.array(edges)
+        lengths = util.compute_lengths_ground(tower_xyz[ends[:, 0]], tower_xyz[ends[:, 1]])
+        for (u2, v2), length in zip(edges, lengths.tolist()):
+            grph[u2][v2]['length'] = length
+    return grph
+
+
+def get_undirected_graph(grph):
+    """
+    Gets the undirected view of a combined graph. Unlike DiGraph.to_undirected(), which keeps the attributes
+    of only one direction of each link, the owners and frequencies of both directions are merged
+    :param grph: Combined directed graph
+    :return: Undirected graph; 'owners' lists the entities operating either direction of a link, and
+    'frequency_list' the frequencies of both directions
+    """
+    G2 = nx.Graph()
+    G2.add_nodes_from(grph.nodes(data=True))
+    for u, v, data in grph.edges(data=True):
+        if G2.has_edge(u, v):
+            merged = G2[u][v]
+            merged['frequency_list'].extend(data['frequency_list'])
+            for corr_name in data['owners']:
+                if corr_name not in merged['owners']:
+                    merged['owners'].append(corr_name)
+        else:
+            G2.add_edge(u, v,
+                        frequency_list=list(data['frequency_list']),
+                        owners=list(data['owners']),
+                        length=data['length'])
+    return G2
+
+
+def find_corridor_latencies(grph):
+    """
+    Gets the minimum stretch paths between CME and the exchanges over the combined network
+    :param grph: Combined directed graph
+    :return: Dictionary of exchange data center ID -> (geodesic distance between the data centers,
+    path length, fiber distance, aggregate stretch, hop count, entities operating the links of the path,
+    latency (microseconds))
+    """
+    nearby_towers, tower_dists = latency.find_nearby_towers(grph, DC)
+    G2 = get_undirected_graph(grph)
+    dsts = {}
+    for dc_id in range(1, len(DC)):
+        dsts[dc_id] = (nearby_towers[dc_id], tower_dists[dc_id])
+    min_stretch_paths = latency.find_min_stretch_paths(G2, nearby_towers[0], tower_dists[0], dsts)
+    results = {}
+    for dc_id in min_stretch_paths:
+        nearest_tower_dc_0, nearest_tower_dc_1, dist_fiber, path, path_length, latency_us = min_stretch_paths[dc_id]
+        geo_dist_dc = util.compute_length_ground(DC[0], DC[dc_id])
+        stretch_aggr = latency.compute_stretch(latency_us, geo_dist_dc)
+        owners = []
+        for i in range(len(path) - 1):
+            for corr_name in G2[path[i]][path[i + 1]]['owners']:
+                if corr_name not in owners:
+                    owners.append(corr_name)
+        results[dc_id] = (geo_dist_dc, path_length, dist_fiber, stretch_aggr, len(path) - 1, owners, latency_us)
+    return results
+
+
+if __name__ == "__main__":
+    entity_graphs = []
+    for entity in ENTITY_NAMES:
+        corr_name = license_data.get_corr_name(entity)
+        try:
+            entity_graphs.append((corr_name, graph_snapshot.read_graph(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE)))
+        except (IOError, ValueError) as e:
+            print("No graph", corr_name, SNAPSHOT_DATE, e)
+    G = build_corridor_graph(entity_graphs)
+    num_towers = sum(entity_graph.number_of_nodes() for corr_name, entity_graph in entity_graphs)
+    print("Towers", num_towers, "merged into", G.number_of_nodes(), "; links", G.number_of_edges())
+    os.makedirs(CORRIDOR_DIR, exist_ok=True)
+    graph_snapshot.write_graph(G, CORRIDOR_DIR)
+    latencies = find_corridor_latencies(G)
+    writer = open(CORRIDOR_DIR + "dist_stretch_owners.txt", 'w')
+    for dc_id in latencies:
+        geo_dist_dc, path_length, dist_fiber, stretch_aggr, hop_count, owners, latency_us = latencies[dc_id]
+        print(DC[dc_id]["name"], geo_dist_dc, path_length, dist_fiber, stretch_aggr, hop_count, owners, latency_us)
+        writer.write(DC[dc_id]["name"]
+                     + "," + str(geo_dist_dc)
+                     + "," + str(path_length)
+                     + "," + str(dist_fiber)
+                     + "," + str(stretch_aggr)
+                     + "," + str(hop_count)
+                     + "," + "|".join(owners)
+                     + "," + str(latency_us)
+                     + "\n")
+    writer.close()
@@ -0,0 +1,305 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Parses scraped FCC license search pages.
+Path detail pages are parsed in a single pass over lxml parser events by parse_path_detail();
+parse_path_detail_bs4() is the original BeautifulSoup parser, kept as a reference for parity checks
+"""
+
+import math
+import lxml.etree
+from bs4 import BeautifulSoup
+
+try:
+    from . import util
+except (ImportError, SystemError):
+    import util
+
+# Exceptions raised by the parsers on malformed pages (missing cells, incomplete locations, bad coordinates)
+PARSE_ERRORS = (AttributeError, IndexError, TypeError, ValueError)
+
+
+def get_tower(coord, elevation):
+    """
+    Builds a tower from its coordinate and elevation strings
+    :param coord: Coordinate in format (example): 41-23-06.4 N, 081-19-32.9 W
+    :param elevation: Elevation string
+    :return: Tower dictionary
+    """
+    lat_deg, long_deg = util.get_decimal_coordinates(coord)
+    return {
+        "lat_deg": lat_deg,
+        "lat_rad": math.radians(lat_deg),
+        "long_deg": long_deg,
+        "long_rad": math.radians(long_deg),
+        "elevation": elevation
+    }
+
+
+def parse_license_dates(text):
+    """
+    Parses various dates (grant date, expiry date, effective date, cancel date) from a license page
+    :param text: License page
+    :return: Dates associated with the license
+    """
+    soup = BeautifulSoup(text, features="lxml")
+    keys = soup.find_all('b')
+    grant_date = None
+    effective_date = None
+    cancel_date = None
+    exp_date = None
+    for key in keys:
+        if key.text.find('Dates') != -1:
+            grant_key = key.findNext('td').findNext('td')
+            grant_date = grant_key.text.strip()
+            exp_key = grant_key.findNext('td').findNext('td')
+            exp_date = exp_key.text.strip()
+            effective_key = exp_key.findNext('td').findNext('td')
+            effective_date = effective_key.text.strip()
+            cancel_key = effective_key.findNext('td').findNext('td')
+            cancel_date = cancel_key.text.strip()
+            break
+    return grant_date, effective_date, cancel_date, exp_date
+
+
+def parse_path_links(text):
+    """
+    Parses the links to path details pages from a license paths summary page
+    :param text: License paths summary page
+    :return: List of links
+    """
+    soup = BeautifulSoup(text, features="lxml")
+    links = []
+    for link in soup.findAll('a'):
+        link_txt = str(link.get('href'))
+        if link_txt.find("licensePathsDetail") != -1:
+            links.append(link_txt)
+    return links
+
+
+def parse_path_detail_bs4(text):
+    """
+    Parses tower details and frequency list from a path details page with BeautifulSoup
+    :param text: Path details page
+    :return: Transmitter, receiver and frequency list of the path
+    """
+    soup = BeautifulSoup(text, features="lxml")
+    keys = soup.find_all('b')
+
+    transmitter = None
+    receiver = None
+    frequencies = []
+    for key in keys:
+        if key.text.find('Transmit')!= -1 and key.text.find('Location')!= -1:
+            coordLabelTag = key
+            while coordLabelTag.contents[0].find("Coordinates") == -1:
+                coordLabelTag = coordLabelTag.findNext('td')
+            coordTag = coordLabelTag.findNext('td')
+            coord = coordTag.contents[0].strip()
+            elevationLabelTag = coordTag
+            while elevationLabelTag.contents[0].find("Elevation") == -1:
+                elevationLabelTag = elevationLabelTag.findNext('td')
+            elevationTag = elevationLabelTag.findNext('td')
+            elevation = elevationTag.contents[0].strip()
+            # print("Transmitter:", coord, elevation)
+            transmitter = get_tower(coord, elevation)
+        if key.text.find('Receiver')!= -1 and key.text.find('Location')!= -1:
+            coordLabelTag = key
+            while coordLabelTag.contents[0].find("Coordinates") == -1:
+                coordLabelTag = coordLabelTag.findNext('td')
+            coordTag = coordLabelTag.findNext('td')
+            coord = coordTag.contents[0].strip()
+            elevationLabelTag = coordTag
+            while elevationLabelTag.contents[0].find("Elevation") == -1:
+                elevationLabelTag = elevationLabelTag.findNext('td')
+            elevationTag = elevationLabelTag.findNext('td')
+            elevation = elevationTag.contents[0].strip()
+            # print("Receiver:", coord, elevation)
+            receiver = get_tower(coord, elevation)
+    tables = soup.findAll("table", {"summary": "Frequencies table"})
+    for table in tables:
+        rows = table.find_all('tr', recursive=False)
+        row_counter = 0
+        for row in rows:
+            row_counter += 1
+            if row_counter >= 3:
+                columns = row.find_all('td', recursive=False)
+                column_counter = 0
+                for column in columns:
+                    column_counter += 1
+                    if column_counter == 2:
+                        frequencies.append(column.contents[0].strip())
+    return transmitter, receiver, frequencies
+
+
+def first_content(element):
+    """
+    Gets the first child of an element like BeautifulSoup's Tag.contents[0]
+    :param element: lxml element
+    :return: Leading text of the element, or its first child element if it has no leading text
+    """
+    if element.text is not None:
+        return element.text
+    if element[0].tag is lxml.etree.Comment:
+        return element[0].text
+    return element[0]
+
+
+def starts_with_label(element, label):
+    """
+    Checks if an element is a label cell, mirroring Tag.contents[0].find(label) != -1 of the BeautifulSoup parser
+    (a cell starting with a child element counts as a label there)
+    :param element: lxml element
+    :param label: Label text
+    :return: True if the element is a label cell
+    """
+    first = first_content(element)
+    if isinstance(first, str):
+        return first.find(label) != -1
+    return True
+
+
+def first_text(element):
+    """
+    Gets the stripped leading text of a value cell
+    :param element: lxml element
+    :return: Stripped text
+    :raises TypeError: if the cell starts with a child element, as Tag.contents[0].strip() does in the
+    BeautifulSoup parser
+    """
+    first = first_content(element)
+    if not isinstance(first, str):
+        raise TypeError("Value cell starts with an element")
+    return first.strip()
+
+
+def location_scanner(key):
+    """
+    Extracts coordinate and elevation of a location from the cells following its <b> header.
+    The generator is sent the <td> elements following the header in document order
+    :param key: <b> header element of the location
+    :return: Generator which returns the coordinate and elevation strings
+    """
+    label = key
+    while not starts_with_label(label, "Coordinates"):
+        label = yield
+    coord_cell = yield
+    coord = first_text(coord_cell)
+    label = coord_cell
+    while not starts_with_label(label, "Elevation"):
+        label = yield
+    elevation_cell = yield
+    return coord, first_text(elevation_cell)
+
+
+def start_scanner(key, key_index, scanners, locations, kind):
+    """
+    Starts a location scanner on a <b> header
+    :param key: <b> header element
+    :param key_index: Position of the header among all headers
+    :param scanners: List of running [kind, key index, scanner] entries
+    :param locations: Scanned locations by kind, as (key index, (coordinate, elevation))
+    :param kind: 'transmitter' or 'receiver'
+    :return: None; the scanner is added to scanners, or its location to locations
+    """
+    scanner = location_scanner(key)
+    try:
+        next(scanner)
+        scanners.append([kind, key_index, scanner])
+    except StopIteration as result:
+        set_location(locations, kind, key_index, result.value)
+
+
+def set_location(locations, kind, key_index, location):
+    """
+    Records a scanned location; as in the BeautifulSoup parser, the location of the last header wins
+    :param locations: Scanned locations by kind, as (key index, (coordinate, elevation))
+    :param kind: 'transmitter' or 'receiver'
+    :param key_index: Position of the header among all headers
+    :param location: Coordinate and elevation strings
+    :return: None
+    """
+    if locations[kind] is None or locations[kind][0] < key_index:
+        locations[kind] = (key_index, location)
+
+
+def parse_path_detail(text):
+    """
+    Parses tower details and frequency list from a path details page in a single pass over the
+    elements in document order, as reported by lxml's parser. Gives the same result as parse_path_detail_bs4(),
+    and fails with the same exception types on malformed pages
+    :param text: Path details page
+    :return: Transmitter, receiver and frequency list of the path
+    """
+    # Unlike lxml.html.fromstring(), parser events also cover content after </html>, as BeautifulSoup does
+    parser = lxml.etree.HTMLPullParser(events=('start',))
+    parser.feed(text)
+    parser.close()
+    locations = {"transmitter": None, "receiver": None}
+    scanners = []
+    key_index = 0
+    frequency_tables = []
+    frequency_rows = {}
+    for event, element in parser.read_events():
+        tag = element.tag
+        if tag == 'td' and scanners:
+            running = []
+            for scanner in scanners:
+                try:
+                    scanner[2].send(element)
+                    running.append(scanner)
+                except StopIteration as result:
+                    set_location(locations, scanner[0], scanner[1], result.value)
+            scanners = running
+        elif tag == 'b':
+            key_index += 1
+            header = "".join(element.itertext())
+            if header.find('Location') != -1:
+                for kind, word in (("transmitter", 'Transmit'), ("receiver", 'Receiver')):
+                    if header.find(word) != -1:
+                        start_scanner(element, key_index, scanners, locations, kind)
+        elif tag == 'table':
+            if element.get('summary') == "Frequencies table":
+                frequency_tables.append(element)
+                frequency_rows[element] = []
+        elif tag == 'tr':
+            table = element.getparent()
+            if table in frequency_rows:
+                frequency_rows[table].append(element)
+    if scanners:
+        # The BeautifulSoup parser fails on the None returned by findNext('td') at the end of the page
+        raise AttributeError("Incomplete location details")
+
+    transmitter = None
+    receiver = None
+    if locations["transmitter"] is not None:
+        transmitter = get_tower(*locations["transmitter"][1])
+    if locations["receiver"] is not None:
+        receiver = get_tower(*locations["receiver"][1])
+    frequencies = []
+    for table in frequency_tables:
+        for row in frequency_rows[table][2:]:
+            columns = [column for column in row if column.tag == 'td']
+            if len(columns) >= 2:
+                frequencies.append(first_content(columns[1]).strip())
+    return transmitter, receiver, frequencies
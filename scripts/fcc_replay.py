@@ -0,0 +1,205 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Serves recorded FCC pages (REPLAY_DIR) from a local http.server stand-in for the FCC sites, and checks that
+generate_license_history.py writes byte-identical snapshot files with one and with several scrape workers.
+Responses are delayed by a few milliseconds depending on the URL, so that concurrent requests complete out of order.
+Run as a script to perform the check; it exits with status 1 if the outputs differ
+"""
+
+import contextlib
+import hashlib
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+try:
+    from . import generate_license_history
+    from . import http_util
+except (ImportError, SystemError):
+    import generate_license_history
+    import http_util
+
+# Recorded pages: license_list.xml (license list of REPLAY_ENTITY), license_<licKey>.html (license pages),
+# paths_<licKey>.html (path summaries) and path_<licKey>_<pathNum>.html (path details)
+REPLAY_DIR = "../fcc_fixtures/replay/"
+
+# Entity whose licenses are recorded
+REPLAY_ENTITY = "New Line Networks"
+
+# Scrape worker counts whose outputs are compared
+CHECK_WORKERS = [1, 8]
+
+# Maximum delay (in seconds) of a response
+MAX_RESPONSE_DELAY = 0.05
+
+# Rate limit of the replayed scrapes; the local server does not need the polite FCC_API default
+REPLAY_REQUESTS_PER_SECOND = 1000.0
+
+# Snapshot files which must be identical for all worker counts
+CHECK_FILES = ["license_list.xml", "license_status_dates.txt", "license_unknown.txt", "network.txt",
+               "failed_fetches.txt"]
+
+
+def get_fixture_file(url):
+    """
+    Maps a request path to its recorded page
+    :param url: Request path with query, e.g. /UlsApp/UlsSearch/licensePathsSum.jsp?licKey=3369929
+    :return: File name in REPLAY_DIR, or None if the page is not recorded
+    """
+    parts = urlsplit(url)
+    page = parts.path.rsplit("/", 1)[-1]
+    query = parse_qs(parts.query)
+    if page == "getLicenses":
+        if unquote(query.get("searchValue", [""])[0]) != REPLAY_ENTITY:
+            return None
+        return "license_list.xml"
+    lic_key = query.get("licKey", [""])[0]
+    if not lic_key.isdigit():
+        return None
+    if page == "license.jsp":
+        return "license_" + lic_key + ".html"
+    if page == "licensePathsSum.jsp":
+        return "paths_" + lic_key + ".html"
+    if page == "licensePathsDetail.jsp":
+        path_num = query.get("pathNum", [""])[0]
+        if path_num.isdigit():
+            return "path_" + lic_key + "_" + path_num + ".html"
+    return None
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers GET requests with recorded pages, and with 404 for pages which are not recorded
+    """
+
+    def do_GET(self):
+        name = get_fixture_file(self.path)
+        path = os.path.join(REPLAY_DIR, name) if name is not None else None
+        if path is None or not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        digest = hashlib.sha1(self.path.encode('utf-8')).digest()
+        time.sleep(MAX_RESPONSE_DELAY * digest[0] / 255)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml" if name.endswith(".xml") else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server():
+    """
+    Starts the replay server on a free local port, on a background thread
+    :return: Server; its base URL is http://127.0.0.1:<server.server_port>/
+    """
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ReplayHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def replay_scrape(server, workers, output_dir):
+    """
+    Scrapes REPLAY_ENTITY from the replay server into a snapshot, without cache and previous snapshot
+    :param server: Replay server
+    :param workers: Number of scrape workers
+    :param output_dir: Output data directory
+    :return: Snapshot directory
+    """
+    base_url = "http://127.0.0.1:" + str(server.server_port) + "/"
+    generate_license_history.FCC_BASE_URL = base_url + "UlsApp/UlsSearch/"
+    generate_license_history.FCC_API_URL = base_url + "api/license-view/"
+    generate_license_history.SCRAPE_WORKERS = workers
+    generate_license_history.PREVIOUS_SNAPSHOT = None
+    generate_license_history.OUTPUT_DIR = output_dir
+    http_util.CACHE_DIR = ""
+    http_util.REQUESTS_PER_SECOND = REPLAY_REQUESTS_PER_SECOND
+    http_util.hosts.clear()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        generate_license_history.scrape_entity(REPLAY_ENTITY)
+    return os.path.join(output_dir, generate_license_history.license_data.get_corr_name(REPLAY_ENTITY),
+                        generate_license_history.SCRAPE_SNAPSHOT)
+
+
+def read_outputs(directory):
+    """
+    Reads the snapshot files which are compared
+    :param directory: Snapshot directory
+    :return: Dictionary of file name -> contents (bytes), or None for missing files
+    """
+    outputs = {}
+    for name in CHECK_FILES:
+        path = os.path.join(directory, name)
+        outputs[name] = None
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                outputs[name] = f.read()
+    return outputs
+
+
+def check_worker_parity():
+    """
+    Scrapes the recorded pages with each of CHECK_WORKERS and compares the snapshot files
+    :return: Number of files which differ from those of the first worker count
+    """
+    server = start_server()
+    output_root = tempfile.mkdtemp()
+    try:
+        reference = None
+        differences = 0
+        for workers in CHECK_WORKERS:
+            start = time.time()
+            directory = replay_scrape(server, workers, os.path.join(output_root, str(workers)) + "/")
+            outputs = read_outputs(directory)
+            print("Workers", workers, time.time() - start, "s",
+                  {name: len(data.splitlines()) for name, data in outputs.items() if data is not None})
+            if reference is None:
+                reference = outputs
+                continue
+            for name in CHECK_FILES:
+                if outputs[name] != reference[name]:
+                    differences += 1
+                    print("Differs", name, "with", workers, "workers")
+        return differences
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(output_root)
+
+
+if __name__ == "__main__":
+    differences = check_worker_parity()
+    print("Differences", differences)
+    if differences:
+        sys.exit(1)
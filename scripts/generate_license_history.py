@@ -24,61 +24,74 @@
 Gets license details for each entity in ENTITY_NAMES by scraping public FCC filing data
 """
 
-import requests
-import math
 import xml.etree.ElementTree as ET
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import networkx as nx
 import os
+import re
+import requests
 
 try:
     from . import util
+    from . import http_util
+    from . import fcc_parser
+    from . import graph_snapshot
+    from . import license_data
+    from . import map_export
 except (ImportError, SystemError):
     import util
+    import http_util
+    import fcc_parser
+    import graph_snapshot
+    import license_data
+    import map_export
+
+
+# FCC License Search URL; can point to a local server which replays recorded FCC pages
+FCC_BASE_URL = os.environ.get("FCC_BASE_URL", "https://wireless2.fcc.gov/UlsApp/UlsSearch/")
+
+# FCC License View API URL
+FCC_API_URL = os.environ.get("FCC_API_URL", "https://data.fcc.gov/api/license-view/")
 
+# Number of licenses scraped concurrently; 1 scrapes licenses sequentially
+SCRAPE_WORKERS = 8
 
-# FCC License Search URL
-FCC_BASE_URL = "https://wireless2.fcc.gov/UlsApp/UlsSearch/"
+# Scrape snapshot (yyyy_mm) generated by this run
+SCRAPE_SNAPSHOT = datetime.now().strftime("%Y_%m")
+
+# Value of PREVIOUS_SNAPSHOT which selects the newest complete scrape snapshot of each entity,
+# SCRAPE_SNAPSHOT itself included (so that rerunning a failed or interrupted scrape resumes it)
+LATEST_SNAPSHOT = "latest"
+
+# Previous scrape snapshot (yyyy_mm) whose unchanged licenses are reused instead of being scraped again;
+# None scrapes all licenses
+PREVIOUS_SNAPSHOT = LATEST_SNAPSHOT
+
+# Whether to also write the human-readable graph_active.yaml next to the binary graph_active.bin snapshot
+WRITE_YAML = False
 
 # Input: HTML header and footer files to generate visualizations
 topFile = "static_html/top.html"
 bottomFile = "static_html/bottom.html"
 
+# Tower and link style of the visualization, and whether chains of nearly collinear links are drawn
+# as one polyline (see map_export)
+MAP_STYLE = {"nodeColor": "red", "nodeSize": 3, "edgeColor": "yellow", "edgeWeight": 2}
+MERGE_COLLINEAR_LINKS = True
+
 # Output data directory
 OUTPUT_DIR = "../output_entity_wise/"
 
 # Entities which operate in the Chicago-NJ corridor
-ENTITY_NAMES = [
-    "AlarmNet, Inc",
-    "Transmission Holdings, Inc.",
-    "BNSF Railway Co.",
-    "COMMONWEALTH EDISON COMPANY",
-    "MPX, Inc",
-    "Illinois Central Railroad Company",
-    "Eastern MLG LLC",
-    "Jefferson Microwave, LLC",
-    "New Line Networks",
-    "Webline Holdings LLC",
-    "GTT Americas LLC",
-    "EG Broadcast Newco Corp",
-    "National Tower Company LLC",
-    "Wireless Internetwork, LLC",
-    "DC2A LLC",
-    "Geodesic Networks LLC",
-    "Blueline Comm",
-    "Argos Engineering, LLC",
-    "xWave Engineering LLC",
-    "North Central Tower Co, LLC",
-    "NeXXCom Wireless LLC",
-    "Fundamental Broadcasting LLC",
-    "AQ2AT LLC",
-    "World Class Wireless, LLC",
-    "Pierce Broadband, LLC",
-    "Spectrum Holding Company LLC",
-    "SW Networks",
-    "iSignal",
-    "Newgig networks"
-]
+ENTITY_NAMES = license_data.ENTITY_NAMES
+
+# Previous scrape snapshot of the entity being scraped (see find_previous_snapshot), and its licenses:
+# license ID -> status line, license ID -> network lines, and the parsed network.txt of the snapshot
+previous_snapshot = None
+previous_status = {}
+previous_network = {}
+previous_paths = None
 
 
 def add_to_graph(transmitter, receiver, frequencies):
@@ -132,25 +145,7 @@ def visualize_graph(writer):
     :param writer: Writer for the HTML file
     :return: None; the HTML file is generated
     """
-    for node in G.nodes(data=True):
-        writer.write("var redSphere = viewer.entities.add({name : '"
-                     + str(node[0])
-                     + "', position: Cesium.Cartesian3.fromDegrees("
-                     + str(node[1]["long_deg"]) + ", "
-                     + str(node[1]["lat_deg"]) + ", 0), "
-                     + "ellipsoid : {radii : new Cesium.Cartesian3(5000.0, 5000.0, 5000.0), "
-                     + "material : Cesium.Color.RED.withAlpha(1),}});\n")
-
-    for edge in G.edges(data=True):
-        print(edge)
-        writer.write("viewer.entities.add({name : '', polyline: { positions: Cesium.Cartesian3.fromDegreesArrayHeights(["
-                     + str(nodes_by_id[edge[0]]["long_deg"]) + ","
-                     + str(nodes_by_id[edge[0]]["lat_deg"]) + ",0,"
-                     + str(nodes_by_id[edge[1]]["long_deg"]) + ","
-                     + str(nodes_by_id[edge[1]]["lat_deg"]) + ",0]), "
-                     + "width: 2.0, arcType: Cesium.ArcType.NONE, "
-                     + "material: new Cesium.PolylineOutlineMaterialProperty({ "
-                     + "color: Cesium.Color.YELLOW.withAlpha(1.0), outlineWidth: 0, outlineColor: Cesium.Color.BLACK})}});\n")
+    map_export.write_map_data(writer, G, MAP_STYLE, merge_collinear=MERGE_COLLINEAR_LINKS)
 
 
 def visualize():
@@ -167,124 +162,74 @@ def visualize():
     writer.close()
 
 
+def fcc_url(url):
+    """
+    Rebases an absolute FCC license search URL (as listed in license_list.xml) on FCC_BASE_URL
+    :param url: FCC license search URL
+    :return: URL on FCC_BASE_URL
+    """
+    return FCC_BASE_URL + url.split("/UlsSearch/")[-1]
+
+
 def get_license_list():
     """
     Generates license list for an entity
     :return: None; the corresponding file with all licenses is generated
     """
-    writer = open(OUT_FILE_LICENSE_LIST, 'w')
     print(FCC_LICENSE_LIST_URL)
-    resp = requests.get(FCC_LICENSE_LIST_URL)
-    print(resp.text)
-    writer.write(str(resp.text))
+    text = http_util.fetch(FCC_LICENSE_LIST_URL, ttl=0)
+    print(text)
+    writer = open(OUT_FILE_LICENSE_LIST, 'w')
+    writer.write(str(text))
     writer.close()
 
 
-def get_license_dates(licDetailURL):
+def get_license_dates(licDetailURL, cache_tag):
     """
     Get various dates (grant date, expiry date, effective date, cancel date) associated with a license
     :param licDetailURL: License URL
+    :param cache_tag: Version of the license used to decide if cached pages are still valid
     :return: Dates associated with the license
     """
-    resp = requests.get(licDetailURL)
-    soup = BeautifulSoup(resp.text, features="lxml")
-    keys = soup.find_all('b')
-    grant_date = None
-    effective_date = None
-    cancel_date = None
-    exp_date = None
-    for key in keys:
-        if key.text.find('Dates') != -1:
-            grant_key = key.findNext('td').findNext('td')
-            grant_date = grant_key.text.strip()
-            exp_key = grant_key.findNext('td').findNext('td')
-            exp_date = exp_key.text.strip()
-            effective_key = exp_key.findNext('td').findNext('td')
-            effective_date = effective_key.text.strip()
-            cancel_key = effective_key.findNext('td').findNext('td')
-            cancel_date = cancel_key.text.strip()
-            break
-    return grant_date, effective_date, cancel_date, exp_date
-
-
-def get_path_detail(licenseID, link_txt, status, writer_network):
-    """
-    Gets tower details and frequency list for individual licenses by parsing scraped data
+    text = http_util.fetch(fcc_url(licDetailURL), tag=cache_tag)
+    return fcc_parser.parse_license_dates(text)
+
+
+def get_path_detail(link_txt, cache_tag):
+    """
+    Gets tower details and frequency list for an individual path of a license by parsing scraped data
+    :param link_txt: Link to the path details page
+    :param cache_tag: Version of the license used to decide if cached pages are still valid
+    :return: Transmitter, receiver and frequency list of the path
+    """
+    path_url = FCC_BASE_URL + link_txt
+    text = http_util.fetch(path_url, tag=cache_tag)
+    return fcc_parser.parse_path_detail(text)
+
+
+def write_path(licenseID, status, transmitter, receiver, frequencies, writer_network):
+    """
+    Adds a scraped path to the graph and writes it to the network file
     :param licenseID: ID of the license
-    :param link_txt: Text associated with the license
     :param status: License status
+    :param transmitter: Transmitting tower
+    :param receiver: Receiving tower
+    :param frequencies: Link operating frequencies
     :param writer_network: Writer for the corresponding output file
     :return: None
     """
-    path_url = FCC_BASE_URL + link_txt
-    resp = requests.get(path_url)
-    soup = BeautifulSoup(resp.text, features="lxml")
-    keys = soup.find_all('b')
-
-    transmitter = None
-    receiver = None
-    frequencies = []
-    for key in keys:
-        if key.text.find('Transmit')!= -1 and key.text.find('Location')!= -1:
-            coordLabelTag = key
-            while coordLabelTag.contents[0].find("Coordinates") == -1:
-                coordLabelTag = coordLabelTag.findNext('td')
-            coordTag = coordLabelTag.findNext('td')
-            coord = coordTag.contents[0].strip()
-            elevationLabelTag = coordTag
-            while elevationLabelTag.contents[0].find("Elevation") == -1:
-                elevationLabelTag = elevationLabelTag.findNext('td')
-            elevationTag = elevationLabelTag.findNext('td')
-            elevation = elevationTag.contents[0].strip()
-            # print("Transmitter:", coord, elevation)
-            lat_deg, long_deg = util.get_decimal_coordinates(coord)
-            transmitter = {
-                "lat_deg": lat_deg,
-                "lat_rad": math.radians(lat_deg),
-                "long_deg": long_deg,
-                "long_rad": math.radians(long_deg),
-                "elevation": elevation
-            }
-        if key.text.find('Receiver')!= -1 and key.text.find('Location')!= -1:
-            coordLabelTag = key
-            while coordLabelTag.contents[0].find("Coordinates") == -1:
-                coordLabelTag = coordLabelTag.findNext('td')
-            coordTag = coordLabelTag.findNext('td')
-            coord = coordTag.contents[0].strip()
-            elevationLabelTag = coordTag
-            while elevationLabelTag.contents[0].find("Elevation") == -1:
-                elevationLabelTag = elevationLabelTag.findNext('td')
-            elevationTag = elevationLabelTag.findNext('td')
-            elevation = elevationTag.contents[0].strip()
-            lat_deg, long_deg = util.get_decimal_coordinates(coord)
-            # print("Receiver:", coord, elevation)
-            receiver = {
-                "lat_deg": lat_deg,
-                "lat_rad": math.radians(lat_deg),
-                "long_deg": long_deg,
-                "long_rad": math.radians(long_deg),
-                "elevation": elevation
-            }
-    tables = soup.findAll("table", {"summary": "Frequencies table"})
-    for table in tables:
-        rows = table.find_all('tr', recursive=False)
-        row_counter = 0
-        for row in rows:
-            row_counter += 1
-            if row_counter >= 3:
-                columns = row.find_all('td', recursive=False)
-                column_counter = 0
-                for column in columns:
-                    column_counter += 1
-                    if column_counter == 2:
-                        frequencies.append(column.contents[0].strip())
-    if status == 'Active':
+    frequencies = license_data.parse_frequencies(frequencies)
+    if status == 'Active' and transmitter != None and receiver != None:
         try:
-            add_to_graph(transmitter, receiver, frequencies)
-        except:
-            pass
+            add_to_graph(license_data.Tower(transmitter['lat_deg'], transmitter['long_deg'],
+                                            license_data.parse_elevation(transmitter['elevation'])),
+                         license_data.Tower(receiver['lat_deg'], receiver['long_deg'],
+                                            license_data.parse_elevation(receiver['elevation'])),
+                         list(frequencies))
+        except ValueError as e:
+            # Elevation which is not a number; the path is written to the network file but left out of the graph
+            record_failure(licenseID, e, "")
     if transmitter != None and receiver != None:
-        print(transmitter, receiver, frequencies)
         writer_network.write(str(licenseID)
                  + ";" + str(status)
                  + ";" + str(transmitter['lat_deg'])
@@ -297,73 +242,255 @@ def get_path_detail(licenseID, link_txt, status, writer_network):
     writer_network.flush()
 
 
-def get_license_detail(licenseID, status, writer_network):
+def get_license_detail(licenseID, cache_tag):
     """
     Get license details by ID by scraping Web pages
     :param licenseID: ID of the license
+    :param cache_tag: Version of the license used to decide if cached pages are still valid
+    :return: List of (transmitter, receiver, frequencies) paths of the license, and list of (URL, error)
+    of the path details pages which could not be parsed
+    """
+    url = FCC_BASE_URL + "licensePathsSum.jsp?licKey=" + licenseID
+    text = http_util.fetch(url, tag=cache_tag)
+    paths = []
+    parse_failures = []
+    for link_txt in fcc_parser.parse_path_links(text):
+        try:
+            paths.append(get_path_detail(link_txt, cache_tag))
+        except fcc_parser.PARSE_ERRORS as e:
+            parse_failures.append((FCC_BASE_URL + link_txt, e))
+    return paths, parse_failures
+
+
+def find_previous_snapshot(corr_name):
+    """
+    Finds the scrape snapshot whose licenses are reused by the scrape of an entity
+    :param corr_name: Directory name of the entity
+    :return: PREVIOUS_SNAPSHOT, or for LATEST_SNAPSHOT the newest snapshot (yyyy_mm, up to SCRAPE_SNAPSHOT)
+    with license_status_dates.txt and network.txt files; None if there is none
+    """
+    if PREVIOUS_SNAPSHOT != LATEST_SNAPSHOT:
+        return PREVIOUS_SNAPSHOT
+    entity_dir = OUTPUT_DIR + corr_name + "/"
+    if not os.path.isdir(entity_dir):
+        return None
+    for snapshot in sorted(os.listdir(entity_dir), reverse=True):
+        if re.match(r"^\d{4}_\d{2}$", snapshot) is None or snapshot > SCRAPE_SNAPSHOT:
+            continue
+        if (os.path.exists(entity_dir + snapshot + "/license_status_dates.txt")
+                and os.path.exists(entity_dir + snapshot + "/network.txt")):
+            return snapshot
+    return None
+
+
+def load_previous_snapshot():
+    """
+    Loads license dates and network paths of the previous scrape snapshot, if any. Everything is read
+    before the new snapshot files are opened, as they may replace the previous ones
+    :return: None; previous_status, previous_network and previous_paths are filled
+    """
+    global previous_status, previous_network, previous_paths
+    previous_status = {}
+    previous_network = {}
+    previous_paths = None
+    if previous_snapshot is None:
+        return
+    if not (os.path.exists(PREV_FILE_LICENSE_STATUS) and os.path.exists(PREV_FILE_NETWORK)):
+        return
+    status_files = [PREV_FILE_LICENSE_STATUS]
+    if os.path.exists(PREV_FILE_LICENSE_UNKNOWN):
+        status_files.append(PREV_FILE_LICENSE_UNKNOWN)
+    for status_file in status_files:
+        for line in open(status_file):
+            parts = line.rstrip('\n').split(",")
+            # License ID, Status, Grant date, Effective date, Cancel date, Expiry date
+            previous_status[parts[0]] = line
+            previous_network[parts[0]] = []
+    for line in open(PREV_FILE_NETWORK):
+        license_id = line.split(";")[0]
+        if license_id in previous_network:
+            previous_network[license_id].append(line)
+    previous_paths = license_data.load_network(PREV_FILE_NETWORK)
+
+
+def is_license_changed(license):
+    """
+    Checks if a license has to be scraped, i.e., it is new or its status or expiry date changed
+    since the previous scrape snapshot
+    :param license: Tuple of license status, ID, detail URL and expiry date
+    :return: True if the license has to be scraped
+    """
+    status, licenseID, licDetailURL, expiredDate = license
+    if licenseID not in previous_status:
+        return True
+    parts = previous_status[licenseID].rstrip('\n').split(",")
+    return parts[1] != status or parts[5] != expiredDate
+
+
+def reuse_license(licenseID, status, writer_status, writer_network):
+    """
+    Copies an unchanged license from the previous scrape snapshot and adds its paths to the graph
+    :param licenseID: ID of the license
     :param status: License status
-    :param writer_network: Writer of the corresponding output file
+    :param writer_status: Writer for the license status file (for 'Unknown' licenses, the unknown license file)
+    :param writer_network: Writer for the network file
+    :return: None
+    """
+    writer_status.write(previous_status[licenseID].rstrip('\n') + "\n")
+    if status == 'Active':
+        for transmitter, receiver, frequencies, length in previous_paths.get_paths(licenseID):
+            add_to_graph(transmitter, receiver, frequencies.tolist())
+    for line in previous_network[licenseID]:
+        writer_network.write(license_data.format_network_line(line) + "\n")
+
+
+def scrape_license(license):
+    """
+    Scrapes dates and paths of a license; runs on a worker thread and does not touch the graph
+    :param license: Tuple of license status, ID, detail URL and expiry date
+    :return: Dates associated with the license, list of its paths, list of (URL, error) of the path details
+    pages which could not be parsed, and the download error if any page failed
+    """
+    status, licenseID, licDetailURL, expiredDate = license
+    # Cached pages are reused as long as the license keeps its status and expiry date
+    cache_tag = str(status) + "," + str(expiredDate)
+    try:
+        dates = get_license_dates(licDetailURL, cache_tag)
+        paths = []
+        parse_failures = []
+        if status != 'Unknown':
+            paths, parse_failures = get_license_detail(licenseID, cache_tag)
+    except requests.RequestException as e:
+        return None, None, None, e
+    return dates, paths, parse_failures, None
+
+
+def record_failure(licenseID, error, url=None):
+    """
+    Appends a license (or the license list) which could not be downloaded to the failure journal.
+    Such licenses are left out of the snapshot, so that the next incremental run scrapes them again.
+    Paths which could not be parsed are journaled too; their licenses are kept without them
+    :param licenseID: ID of the license; '-' for the license list
+    :param error: Download or parse error
+    :param url: URL of the failed page; by default the URL of the failed download request
     :return: None
     """
-    url = "https://wireless2.fcc.gov/UlsApp/UlsSearch/licensePathsSum.jsp?licKey="+licenseID
-    resp = requests.get(url)
-    soup = BeautifulSoup(resp.text, features="lxml")
-    for link in soup.findAll('a'):
-        link_txt = str(link.get('href'))
-        if link_txt.find("licensePathsDetail") != -1:
-            try:
-                get_path_detail(licenseID, link_txt, status, writer_network)
-            except:
-                pass
+    if url is None:
+        url = error.request.url if error.request is not None else ""
+    print("Failed", licenseID, url, error)
+    with open(OUT_FILE_FAILURES, 'a') as writer:
+        writer.write(str(licenseID) + ";" + str(url) + ";" + str(error).replace("\n", " ") + "\n")
 
 
 def parse_license_list():
     """
-    Parse individual licenses sequentially, scrape data, and generate graph
+    Parse individual licenses concurrently, scrape data, and generate graph.
+    Licenses unchanged since the previous scrape snapshot are copied instead of being scraped.
+    Results are written in license list order, so the output does not depend on SCRAPE_WORKERS.
+    'Unknown' licenses have no paths and are not written to the license status file; they are listed in
+    the unknown license file (with the expiry date of the license list), so that they are not scraped again
     :return: None
     """
-    writer_status = open(OUT_FILE_LICENSE_STATUS, 'w')
-    writer_network = open(OUT_FILE_NETWORK, 'w')
     root = ET.parse(OUT_FILE_LICENSE_LIST).getroot()
+    licenses = []
     for child1 in root:
         if child1.tag.find('Licenses')!= -1:
             for child2 in child1:
                 if child2.tag.find('License')!= -1:
                     status = child2[5].text
+                    expiredDate = child2[6].text
                     licenseID = child2[7].text
                     licDetailURL = child2[8].text
-                    grant_date, effective_date, cancel_date, exp_date = get_license_dates(licDetailURL)
-                    print(status, licenseID, grant_date, effective_date, cancel_date, exp_date)
-                    if status != 'Unknown':
-                        writer_status.write(str(licenseID)
-                                        + "," + str(status)
-                                        + "," + str(grant_date)
-                                        + "," + str(effective_date)
-                                        + "," + str(cancel_date)
-                                        + "," + str(exp_date)
-                                        + "\n")
-                        writer_status.flush()
-                        get_license_detail(licenseID, status, writer_network)
+                    licenses.append((status, licenseID, licDetailURL, expiredDate))
+    changed = [is_license_changed(license) for license in licenses]
+    changed_licenses = [license for license, is_changed in zip(licenses, changed) if is_changed]
+    print("Scraping", len(changed_licenses), "of", len(licenses), "licenses")
+    # The new files may replace the ones of the previous snapshot, which has been loaded at this point
+    writer_status = open(OUT_FILE_LICENSE_STATUS, 'w')
+    writer_unknown = open(OUT_FILE_LICENSE_UNKNOWN, 'w')
+    writer_network = open(OUT_FILE_NETWORK, 'w')
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as executor:
+        results = executor.map(scrape_license, changed_licenses)
+        for license, is_changed in zip(licenses, changed):
+            status, licenseID, licDetailURL, expiredDate = license
+            if not is_changed:
+                reuse_license(licenseID, status, writer_unknown if status == 'Unknown' else writer_status,
+                              writer_network)
+                continue
+            dates, paths, parse_failures, error = next(results)
+            if error is not None:
+                record_failure(licenseID, error)
+                continue
+            for url, parse_error in parse_failures:
+                record_failure(licenseID, parse_error, url)
+            grant_date, effective_date, cancel_date, exp_date = dates
+            print(status, licenseID, grant_date, effective_date, cancel_date, exp_date)
+            if status == 'Unknown':
+                writer_unknown.write(str(licenseID)
+                                     + "," + str(status)
+                                     + "," + str(grant_date)
+                                     + "," + str(effective_date)
+                                     + "," + str(cancel_date)
+                                     + "," + str(expiredDate)
+                                     + "\n")
+            else:
+                writer_status.write(str(licenseID)
+                                + "," + str(status)
+                                + "," + str(grant_date)
+                                + "," + str(effective_date)
+                                + "," + str(cancel_date)
+                                + "," + str(exp_date)
+                                + "\n")
+                writer_status.flush()
+                for transmitter, receiver, frequencies in paths:
+                    write_path(licenseID, status, transmitter, receiver, frequencies, writer_network)
     writer_status.close()
+    writer_unknown.close()
     writer_network.close()
 
 
-for entity in ENTITY_NAMES:
-    corr_name = entity.replace(" ", "_").replace("/", "_").replace(".", "_").replace(",", "_").replace("&", "_")
-    os.makedirs(OUTPUT_DIR + corr_name +"/2020_04")
+def scrape_entity(entity):
+    """
+    Scrapes the licenses of an entity into a new scrape snapshot (SCRAPE_SNAPSHOT) and builds its graph
+    :param entity: Entity name
+    :return: None; the snapshot files are written
+    """
+    global G, nodes, nodes_by_id, global_node_counter, edges, FCC_LICENSE_LIST_URL, previous_snapshot
+    global OUT_FILE_LICENSE_LIST, OUT_FILE_LICENSE_STATUS, OUT_FILE_HTML, OUT_FILE_NETWORK, OUT_FILE_LICENSE_UNKNOWN
+    global PREV_FILE_LICENSE_STATUS, PREV_FILE_LICENSE_UNKNOWN, PREV_FILE_NETWORK, OUT_FILE_FAILURES
+    corr_name = license_data.get_corr_name(entity)
+    os.makedirs(OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT, exist_ok=True)
     G = nx.DiGraph()
     nodes = {}
     nodes_by_id = {}
     global_node_counter = 0
     edges = {}
-    FCC_LICENSE_LIST_URL = "https://data.fcc.gov/api/license-view/basicSearch/getLicenses?searchValue="+entity
-    OUT_FILE_LICENSE_LIST = OUTPUT_DIR + corr_name +"/2020_04/license_list.xml"
-    OUT_FILE_LICENSE_STATUS = OUTPUT_DIR + corr_name +"/2020_04/license_status_dates.txt"
-    OUT_FILE_HTML = OUTPUT_DIR + corr_name +"/2020_04/viz_active.html"
-    OUT_FILE_NETWORK = OUTPUT_DIR + corr_name +"/2020_04/network.txt"
-    OUT_FILE_GRAPH = OUTPUT_DIR + corr_name +"/2020_04/graph_active.yaml"
-
-    get_license_list()
+    FCC_LICENSE_LIST_URL = FCC_API_URL + "basicSearch/getLicenses?searchValue="+entity
+    OUT_FILE_LICENSE_LIST = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/license_list.xml"
+    OUT_FILE_LICENSE_STATUS = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/license_status_dates.txt"
+    OUT_FILE_HTML = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/viz_active.html"
+    OUT_FILE_NETWORK = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/network.txt"
+    OUT_FILE_LICENSE_UNKNOWN = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/license_unknown.txt"
+    previous_snapshot = find_previous_snapshot(corr_name)
+    print(entity, "previous snapshot", previous_snapshot)
+    PREV_FILE_LICENSE_STATUS = OUTPUT_DIR + corr_name + "/" + str(previous_snapshot) + "/license_status_dates.txt"
+    PREV_FILE_LICENSE_UNKNOWN = OUTPUT_DIR + corr_name + "/" + str(previous_snapshot) + "/license_unknown.txt"
+    PREV_FILE_NETWORK = OUTPUT_DIR + corr_name + "/" + str(previous_snapshot) + "/network.txt"
+    OUT_FILE_FAILURES = OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT + "/failed_fetches.txt"
+    if os.path.exists(OUT_FILE_FAILURES):
+        os.remove(OUT_FILE_FAILURES)
+
+    load_previous_snapshot()
+    try:
+        get_license_list()
+    except requests.RequestException as e:
+        record_failure('-', e)
+        return
     parse_license_list()
     visualize()
-    nx.write_yaml(G, OUT_FILE_GRAPH)
+    graph_snapshot.write_graph(G, OUTPUT_DIR + corr_name + "/" + SCRAPE_SNAPSHOT, write_yaml=WRITE_YAML)
+
+
+if __name__ == "__main__":
+    for entity in ENTITY_NAMES:
+        scrape_entity(entity)
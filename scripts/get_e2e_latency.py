@@ -25,12 +25,20 @@ Finds end-to-end latencies between data centers in the Chicago - NY corridor
 """
 
 import networkx as nx
-import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from . import util
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
 except (ImportError, SystemError):
     import util
+    import graph_snapshot
+    import latency
+    import license_data
 
 EARTH_RADIUS = 6371  # km
 
@@ -40,236 +48,164 @@ SNAPSHOT_DATE = "01_01_2013"
 # Output data directory
 OUTPUT_DIR = "../output_entity_wise/"
 
-# Output file
-OUT_FILE = OUTPUT_DIR + SNAPSHOT_DATE + "_ny4/NY4_dist_stretch_pathcount.txt"
+# Exchanges (names in latency.DATA_CENTERS) whose latencies from CME are computed in one pass
+EXCHANGES = ["ny4", "nyse", "nasdaq"]
 
-# Data centers DC[0] is CME CyrusOne, DC[1] can be NY4/NYSE/NASDAQ
-DC = {}
-DC[0] = {
-    "lat_deg": 41.7965645,
-    "lat_rad": math.radians(41.7965645),
-    "long_deg": -88.243012,
-    "long_rad": math.radians(-88.243012),
-}  # CME
+# Data centers DC[0] is CME CyrusOne, DC[1], DC[2], ... are the exchanges
+DC = latency.get_data_centers(["cme"] + EXCHANGES)
 
+# Output files of the exchanges
+OUT_FILE = {}
+for dc_id in range(1, len(DC)):
+    OUT_FILE[dc_id] = (OUTPUT_DIR + SNAPSHOT_DATE + "_" + DC[dc_id]["name"] + "/"
+                       + DC[dc_id]["name"].upper() + "_dist_stretch_pathcount.txt")
 
-
-DC[1] = {
-    "lat_deg": 40.7772608,
-    "lat_rad": math.radians(40.7772608),
-    "long_deg": -74.071748,
-    "long_rad": math.radians(-74.071748)
-}  # NY4
-
-"""
-DC[1] = {
-    "lat_deg": 41.0783577,
-    "lat_rad": math.radians(41.0783577),
-    "long_deg": -74.1529141,
-    "long_rad": math.radians(-74.1529141)
-}  # NYSE
-"""
-"""
-DC[1] = {
-    "lat_deg": 40.5843303,
-    "lat_rad": math.radians(40.5843303),
-    "long_deg": -74.2434266,
-    "long_rad": math.radians(-74.2434266)
-}  # NASDAQ
-"""
+# Number of entities processed in parallel by worker processes; 1 processes them sequentially
+LATENCY_WORKERS = os.cpu_count()
 
 # Entities which operate in the Chicago-NJ corridor
-ENTITY_NAMES = [
-    "AlarmNet, Inc",
-    "Transmission Holdings, Inc.",
-    "BNSF Railway Co.",
-    "COMMONWEALTH EDISON COMPANY",
-    "MPX, Inc",
-    "Illinois Central Railroad Company",
-    "Eastern MLG LLC",
-    "Jefferson Microwave, LLC",
-    "New Line Networks",
-    "Webline Holdings LLC",
-    "GTT Americas LLC",
-    "EG Broadcast Newco Corp",
-    "National Tower Company LLC",
-    "Wireless Internetwork, LLC",
-    "DC2A LLC",
-    "Geodesic Networks LLC",
-    "Blueline Comm",
-    "Argos Engineering, LLC",
-    "xWave Engineering LLC",
-    "North Central Tower Co, LLC",
-    "NeXXCom Wireless LLC",
-    "Fundamental Broadcasting LLC",
-    "AQ2AT LLC",
-    "World Class Wireless, LLC",
-    "Pierce Broadband, LLC",
-    "Spectrum Holding Company LLC",
-    "SW Networks",
-    "iSignal",
-    "Newgig networks"
-]
+ENTITY_NAMES = license_data.ENTITY_NAMES
 
 
-def find_inter_DC_min_lat(wr, corr_name):
+def find_inter_DC_min_lat(G, corr_name):
     """
     Gets shortest path latency between data centers assuming that
     data centers have shortest length fiber connectivity with towers
     within a radius of 50 km
-    :param wr: Output writer
+    :param G: Directed graph
     :param corr_name: Entity name
-    :return: None; writes output to a file
+    :return: Dictionary of exchange data center ID -> output line, for the exchanges reachable over the network
     """
-    nearby_towers = {}
-    tower_dists = {}
-    for id in DC:
-        nearby_towers[id] = []
-        tower_dists[id] = []
-    for node in G.nodes(data=True):
-        G.nodes[node[0]]["lat_rad"] = math.radians(float(node[1]['lat_deg']))
-        G.nodes[node[0]]["long_rad"] = math.radians(float(node[1]['long_deg']))
-        for id in DC:
-            dist = util.compute_length_ground(DC[id], node[1])
-            if dist < 50.0:  # towers within a 50 km radius
-                nearby_towers[id].append(node)
-                tower_dists[id].append(dist)
+    nearby_towers, tower_dists = latency.find_nearby_towers(G, DC)  # towers within a 50 km radius
     G2 = G.to_undirected()
+    dsts = {}
     for dc_id in range(1, len(DC)):
-        nearest_tower_dc_0 = None
-        nearest_tower_dc_1 = None
-        min_aggr_stretch = 99999.0
-        min_dist_fiber = 99999.0
-        for id1 in range(len(nearby_towers[0])):
-            for id2 in range(len(nearby_towers[dc_id])):
-                try:
-                    path = nx.shortest_path(G2, nearby_towers[0][id1][0], nearby_towers[dc_id][id2][0], weight='length')
-                    path_length = nx.shortest_path_length(G2, nearby_towers[0][id1][0], nearby_towers[dc_id][id2][0],
-                                                          weight='length')
-                    # print(date, path)
-                    geo_dist_towers = util.compute_length_ground(nearby_towers[0][id1][1], nearby_towers[dc_id][id2][1])
-                    geo_dist_dc = util.compute_length_ground(DC[0], DC[dc_id])
-                    stretch = path_length / geo_dist_towers
-                    dist_fiber = tower_dists[0][id1] + tower_dists[dc_id][id2]
-                    stretch_aggr = ((dist_fiber / 200) + (path_length / 300)) / (geo_dist_dc / 300)
-                    if stretch_aggr < min_aggr_stretch:
-                        min_aggr_stretch = stretch_aggr
-                        nearest_tower_dc_0 = nearby_towers[0][id1]
-                        nearest_tower_dc_1 = nearby_towers[dc_id][id2]
-                        min_dist_fiber = dist_fiber
-                        # print(date, stretch_aggr)
-                except:
-                    pass
-        path = nx.shortest_path(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length')
-        path_length = nx.shortest_path_length(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length')
-        hop_count = nx.shortest_path_length(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0])
-        simple_path_counter = 0
-        geo_dist_towers = util.compute_length_ground(nearest_tower_dc_0[1], nearest_tower_dc_1[1])
-        geo_dist_dc = util.compute_length_ground(DC[0], DC[id])
-        stretch = path_length / geo_dist_towers
-        dist_fiber = min_dist_fiber
-        stretch_aggr = ((dist_fiber / 200) + (path_length / 300)) / (geo_dist_dc / 300)
-
-        sel_edges = {}
-        for p in nx.shortest_simple_paths(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length'):
-            p_len = 0
-            for i in range(len(p) - 1):
-                p_len += G2[p[i]][p[i + 1]]['length']
-            p_stretch = ((dist_fiber / 200) + (p_len / 300)) / (geo_dist_dc / 300)
-            #if p_stretch < (1 + 1.1 * (stretch_aggr - 1)):
-            if p_stretch < 1.05:
-                for i in range(len(p) - 1):
-                    sel_edges[p[i], p[i + 1]] = 1
-                #print(p_stretch, stretch_aggr)
-                simple_path_counter += 1
-            else:
-                break
-
-        path_diversity_counter = 0
-        # print(path)
-        for i in range(len(path) - 1):
-            # print(path[i], path[i+1])
-            try:
-                G3 = G2.copy()
-                G3.remove_edge(path[i], path[i + 1])
-                red_path_length = nx.shortest_path_length(G3, nearest_tower_dc_0[0], nearest_tower_dc_1[0],
-                                                          weight='length')
-                red_path_stretch = ((dist_fiber / 200) + (red_path_length / 300)) / (geo_dist_dc / 300)
-                if red_path_stretch < 1.05:
-                    path_diversity_counter += 1
-            except:
-                pass
-        path_diversity = path_diversity_counter / (len(path) - 1)
-
-        writer1 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_lengths_red.txt", "w")
-        writer2 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_freqs_red.txt", "w")
-        for k1, k2 in sel_edges:
-            writer1.write(str(G2[k1][k2]['length']) + "\n")
-            list = G2[k1][k2]['frequency_list']
-            for elem in list:
-                try:
-                    freq = float(elem.replace("'", ""))
-                    writer2.write(str(freq) + "\n")
-                except:
-                    pass
-        writer1.close()
-        writer2.close()
-
-
-        link_lens = []
-        frequencies = []
-        for i in range(0, len(path) - 1):
-            link_lens.append(G2[path[i]][path[i + 1]]['length'])
-            list = G2[path[i]][path[i + 1]]['frequency_list']
-            for elem in list:
-                try:
-                    freq = float(elem.replace("'", ""))
-                    frequencies.append(freq)
-                except:
-                    pass
-        link_lens.sort()
-        frequencies.sort()
-        median_link_len = link_lens[math.floor(len(link_lens) / 2)]
-        median_freq = frequencies[math.floor(len(frequencies) / 2)]
-
-        # if dist_fiber < 10.0:
-        print(corr_name, geo_dist_dc, path_length, dist_fiber, stretch, stretch_aggr, simple_path_counter, hop_count)
-        wr.write(corr_name
-                 + "," + str(geo_dist_dc)
-                 + "," + str(path_length)
-                 + "," + str(dist_fiber)
-                 + "," + str(stretch)
-                 + "," + str(stretch_aggr)
-                 + "," + str(simple_path_counter)
-                 + "," + str(median_link_len)
-                 + "," + str(median_freq)
-                 + "," + str(path_diversity)
-                 + "," + str(hop_count)
-                 + "\n")
-
-        writer1 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_lengths.txt", "w")
-        writer2 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_freqs.txt", "w")
-        for i in range(0, len(path) - 1):
-            writer1.write(str(G2[path[i]][path[i + 1]]['length']) + "\n")
-            list = G2[path[i]][path[i + 1]]['frequency_list']
-            for elem in list:
-                try:
-                    freq = float(elem.replace("'", ""))
-                    writer2.write(str(freq) + "\n")
-                except:
-                    pass
-        writer1.close()
-        writer2.close()
-
+        dsts[dc_id] = (nearby_towers[dc_id], tower_dists[dc_id])
+    # One shortest path tree from the CME side for all exchanges
+    min_stretch_paths = latency.find_min_stretch_paths(G2, nearby_towers[0], tower_dists[0], dsts)
+    lines = {}
+    for dc_id in range(1, len(DC)):
+        try:
+            lines[dc_id] = find_DC_pair_min_lat(corr_name, G2, dc_id, min_stretch_paths[dc_id])
+        except:
+            pass
+    return lines
 
-writer = open(OUT_FILE, 'w')
 
-for entity in ENTITY_NAMES:
-    corr_name = entity.replace(" ", "_").replace("/", "_").replace(".", "_").replace(",", "_").replace("&", "_")
-    IN_FILE_GRAPH = OUTPUT_DIR +corr_name.replace(" ", "_")+"/"+SNAPSHOT_DATE+"/graph_active.yaml"
+def find_DC_pair_min_lat(corr_name, G2, dc_id, min_stretch_path):
+    """
+    Gets the latency metrics between CME and an exchange from the minimum stretch path between them.
+    Link lengths and frequencies of the paths to DC[1] are written to link_*.txt, and those of the paths
+    to the other exchanges to link_*_<exchange name>.txt
+    :param corr_name: Entity name
+    :param G2: Undirected graph
+    :param dc_id: Exchange data center ID
+    :param min_stretch_path: Source tower, destination tower, fiber distance, path, path length and latency
+    :return: Output line; writes the link files
+    """
+    link_suffix = "" if dc_id == 1 else "_" + DC[dc_id]["name"]
+    nearest_tower_dc_0, nearest_tower_dc_1, min_dist_fiber, path, path_length, latency_us = min_stretch_path
+    hop_count = nx.shortest_path_length(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0])
+    geo_dist_towers = util.compute_length_ground(nearest_tower_dc_0[1], nearest_tower_dc_1[1])
+    geo_dist_dc = util.compute_length_ground(DC[0], DC[dc_id])
+    stretch = path_length / geo_dist_towers
+    dist_fiber = min_dist_fiber
+    stretch_aggr = latency.compute_stretch(latency_us, geo_dist_dc)
+
+    # Paths with stretch < 1.05, bounding their latencies as radio distances including the hop delays
+    max_p_len = 1.05 * geo_dist_dc - dist_fiber * latency.get_fiber_factor()
+    simple_path_counter, sel_edges = latency.find_near_optimal_paths_summary(
+        G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], max_p_len, latency.LATENCY_WEIGHT)
+
+    path_diversity_counter = 0
+    replacement_lengths = latency.find_replacement_path_lengths(G2, path, latency.LATENCY_WEIGHT)
+    for red_path_length in replacement_lengths:
+        # The replacement lengths include the hop delays
+        red_path_stretch = latency.compute_stretch(latency.compute_latency(dist_fiber, red_path_length, 0), geo_dist_dc)
+        if red_path_stretch < 1.05:
+            path_diversity_counter += 1
+    path_diversity = path_diversity_counter / (len(path) - 1)
+
+    writer1 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_lengths_red" + link_suffix + ".txt", "w")
+    writer2 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_freqs_red" + link_suffix + ".txt", "w")
+    for k1, k2 in sel_edges:
+        writer1.write(str(G2[k1][k2]['length']) + "\n")
+        for freq in G2[k1][k2]['frequency_list']:
+            writer2.write(str(freq) + "\n")
+    writer1.close()
+    writer2.close()
+
+    link_lens, frequencies = latency.get_link_arrays(G2, list(zip(path[:-1], path[1:])))
+    median_link_len = latency.get_upper_median(link_lens)
+    median_freq = latency.get_upper_median(frequencies)
+
+    # if dist_fiber < 10.0:
+    print(corr_name, geo_dist_dc, path_length, dist_fiber, stretch, stretch_aggr, simple_path_counter, hop_count,
+          latency_us)
+    line = (corr_name
+            + "," + str(geo_dist_dc)
+            + "," + str(path_length)
+            + "," + str(dist_fiber)
+            + "," + str(stretch)
+            + "," + str(stretch_aggr)
+            + "," + str(simple_path_counter)
+            + "," + str(median_link_len)
+            + "," + str(median_freq)
+            + "," + str(path_diversity)
+            + "," + str(hop_count)
+            + "," + str(latency_us)
+            + "\n")
+
+    # Extra latency of the best detour around each link of the path, as radio distance (km)
+    path_weight = path_length + (len(path) - 1) * latency.get_hop_length()
+    writer = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_detour_penalties" + link_suffix + ".txt", "w")
+    for red_path_length in replacement_lengths:
+        writer.write(str(red_path_length - path_weight) + "\n")
+    writer.close()
+
+    writer1 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_lengths" + link_suffix + ".txt", "w")
+    writer2 = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/link_freqs" + link_suffix + ".txt", "w")
+    for i in range(0, len(path) - 1):
+        writer1.write(str(G2[path[i]][path[i + 1]]['length']) + "\n")
+        for freq in G2[path[i]][path[i + 1]]['frequency_list']:
+            writer2.write(str(freq) + "\n")
+    writer1.close()
+    writer2.close()
+    return line
+
+
+def find_entity_latencies(corr_name):
+    """
+    Gets the latencies between CME and the exchanges over the network of an entity; run by the worker processes
+    :param corr_name: Entity name
+    :return: Dictionary of exchange data center ID -> output line, run time (s)
+    """
+    start = time.time()
+    IN_DIR_GRAPH = OUTPUT_DIR + corr_name.replace(" ", "_") + "/" + SNAPSHOT_DATE
     try:
-        G = nx.read_yaml(IN_FILE_GRAPH)
-        find_inter_DC_min_lat(writer, corr_name)
+        G = graph_snapshot.read_graph(IN_DIR_GRAPH)
+        lines = find_inter_DC_min_lat(G, corr_name)
     except:
-        pass
-writer.close()
+        lines = {}
+    return lines, time.time() - start
+
+
+if __name__ == "__main__":
+    writers = {}
+    for dc_id in range(1, len(DC)):
+        os.makedirs(os.path.dirname(OUT_FILE[dc_id]), exist_ok=True)
+        writers[dc_id] = open(OUT_FILE[dc_id], 'w')
+
+    corr_names = []
+    for entity in ENTITY_NAMES:
+        corr_names.append(license_data.get_corr_name(entity))
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=LATENCY_WORKERS) as executor:
+        # Results come in entity order, so the output does not depend on LATENCY_WORKERS
+        for corr_name, (lines, run_time) in zip(corr_names, executor.map(find_entity_latencies, corr_names)):
+            print("Job", corr_name, "%.3f s" % run_time)
+            for dc_id in lines:
+                writers[dc_id].write(lines[dc_id])
+    for dc_id in writers:
+        writers[dc_id].close()
+    print("Total", "%.3f s" % (time.time() - start))
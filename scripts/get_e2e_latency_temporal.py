@@ -25,60 +25,36 @@ Finds end-to-end latencies between data centers in the Chicago - NY corridor
 over all networks for list of dates
 """
 
-import networkx as nx
-import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 try:
     from . import util
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
 except (ImportError, SystemError):
     import util
+    import graph_snapshot
+    import latency
+    import license_data
 
 EARTH_RADIUS = 6371  # km
 
-# Data centers DC[0] is CME CyrusOne, DC[1] can be NY4/NYSE/NASDAQ
-DC = {}
-DC[0] = {
-    "lat_deg": 41.7965645,
-    "lat_rad": math.radians(41.7965645),
-    "long_deg": -88.243012,
-    "long_rad": math.radians(-88.243012),
-    "name": "cme"
-}  # CME
+# Exchanges (names in latency.DATA_CENTERS) whose latencies from CME are computed in one pass
+EXCHANGES = ["ny4", "nyse", "nasdaq"]
 
-
-
-DC[1] = {
-    "lat_deg": 40.7772608,
-    "lat_rad": math.radians(40.7772608),
-    "long_deg": -74.071748,
-    "long_rad": math.radians(-74.071748),
-    "name": "ny4"
-}  # NY4
-
-"""
-DC[1] = {
-    "lat_deg": 41.0783577,
-    "lat_rad": math.radians(41.0783577),
-    "long_deg": -74.1529141,
-    "long_rad": math.radians(-74.1529141),
-    "name": "nyse"
-}  # NYSE
-"""
-"""
-DC[1] = {
-    "lat_deg": 40.5843303,
-    "lat_rad": math.radians(40.5843303),
-    "long_deg": -74.2434266,
-    "long_rad": math.radians(-74.2434266),
-    "name": "nasdaq"
-}  # NASDAQ
-"""
+# Data centers DC[0] is CME CyrusOne, DC[1], DC[2], ... are the exchanges
+DC = latency.get_data_centers(["cme"] + EXCHANGES)
 
 # Output data directory
 OUTPUT_DIR = "../output_entity_wise/"
 
-# Temporal output directory
-TEMPORAL_DIR = OUTPUT_DIR + "00_temporal_" + DC[1]["name"] + "/"
+# Temporal output directories of the exchanges
+TEMPORAL_DIR = {}
+for dc_id in range(1, len(DC)):
+    TEMPORAL_DIR[dc_id] = OUTPUT_DIR + "00_temporal_" + DC[dc_id]["name"] + "/"
 
 # Entities which operate in the Chicago-NJ corridor
 ENTITY_NAMES = [
@@ -128,137 +104,140 @@ SNAPSHOT_DATES = [
     "04_01_2020"
 ]  # mm_dd_yyyy
 
+# Number of (entity, date) snapshots processed in parallel by worker processes; 1 processes them sequentially
+LATENCY_WORKERS = os.cpu_count()
+
+# Number of values following the date in an output line (see find_DC_pair_min_lat)
+OUTPUT_COLUMNS = 10
 
-def find_inter_DC_min_lat(wr, date):
+
+def get_empty_line(date):
+    """
+    Gets the output line of a date on which no latency could be computed
+    :param date: Date of reconstruction
+    :return: Output line with the date and OUTPUT_COLUMNS empty values
+    """
+    return date + "," * OUTPUT_COLUMNS + "\n"
+
+
+def find_inter_DC_min_lat(G, date):
     """
     Gets shortest path latency between data centers assuming that
     data centers have shortest length fiber connectivity with towers
     within a radius of 50 km
-    :param wr: Output writer
+    :param G: Directed graph
     :param date: Date of reconstruction
-    :return: None; writes output to a file
+    :return: Dictionary of exchange data center ID -> output line
     """
-    nearby_towers = {}
-    tower_dists = {}
-    for id in DC:
-        nearby_towers[id] = []
-        tower_dists[id] = []
-    for node in G.nodes(data=True):
-        G.nodes[node[0]]["lat_rad"] = math.radians(float(node[1]['lat_deg']))
-        G.nodes[node[0]]["long_rad"] = math.radians(float(node[1]['long_deg']))
-        for id in DC:
-            dist = util.compute_length_ground(DC[id], node[1])
-            if dist < 50.0:  # towers within a 50 km radius
-                nearby_towers[id].append(node)
-                tower_dists[id].append(dist)
+    nearby_towers, tower_dists = latency.find_nearby_towers(G, DC)  # towers within a 50 km radius
     G2 = G.to_undirected()
+    dsts = {}
+    for dc_id in range(1, len(DC)):
+        dsts[dc_id] = (nearby_towers[dc_id], tower_dists[dc_id])
+    # One shortest path tree from the CME side for all exchanges
+    min_stretch_paths = latency.find_min_stretch_paths(G2, nearby_towers[0], tower_dists[0], dsts)
+    lines = {}
     for dc_id in range(1, len(DC)):
-        nearest_tower_dc_0 = None
-        nearest_tower_dc_1 = None
-        min_aggr_stretch = 99999.0
-        min_dist_fiber = 99999.0
-        for id1 in range(len(nearby_towers[0])):
-            for id2 in range(len(nearby_towers[dc_id])):
-                try:
-                    path = nx.shortest_path(G2, nearby_towers[0][id1][0], nearby_towers[dc_id][id2][0], weight='length')
-                    path_length = nx.shortest_path_length(G2, nearby_towers[0][id1][0],nearby_towers[dc_id][id2][0], weight='length')
-                    #print(date, path)
-                    geo_dist_towers = util.compute_length_ground(nearby_towers[0][id1][1], nearby_towers[dc_id][id2][1])
-                    geo_dist_dc = util.compute_length_ground(DC[0], DC[dc_id])
-                    stretch = path_length / geo_dist_towers
-                    dist_fiber = tower_dists[0][id1] + tower_dists[dc_id][id2]
-                    stretch_aggr = ((dist_fiber / 200) + (path_length / 300)) / (geo_dist_dc / 300)
-                    if stretch_aggr < min_aggr_stretch:
-                        min_aggr_stretch = stretch_aggr
-                        nearest_tower_dc_0 = nearby_towers[0][id1]
-                        nearest_tower_dc_1 = nearby_towers[dc_id][id2]
-                        min_dist_fiber = dist_fiber
-                        #print(date, stretch_aggr)
-                except:
-                    pass
-        path = nx.shortest_path(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length')
-        path_length = nx.shortest_path_length(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length')
-        geo_dist_towers = util.compute_length_ground(nearest_tower_dc_0[1], nearest_tower_dc_1[1])
-        geo_dist_dc = util.compute_length_ground(DC[0], DC[id])
-        stretch = path_length / geo_dist_towers
-        dist_fiber = min_dist_fiber
-
-        stretch_aggr = ((dist_fiber / 200) + (path_length / 300)) / (geo_dist_dc / 300)
-
-        simple_path_counter = 0
-        for p in nx.shortest_simple_paths(G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length'):
-            p_len = 0
-            for i in range(len(p) - 1):
-                p_len += G2[p[i]][p[i + 1]]['length']
-            p_stretch = ((dist_fiber / 200) + (p_len / 300)) / (geo_dist_dc / 300)
-            # if p_stretch < (1 + 1.1 * (stretch_aggr - 1)):
-            if p_stretch < 1.05:
-                # print(p_stretch, stretch_aggr)
-                #print(p)
-                simple_path_counter += 1
-            else:
-                break
-
-
-        path_diversity_counter = 0
-        #print(path)
-        for i in range(len(path) - 1):
-            #print(path[i], path[i+1])
-            try:
-                G3 = G2.copy()
-                G3.remove_edge(path[i], path[i+1])
-                red_path_length = nx.shortest_path_length(G3, nearest_tower_dc_0[0], nearest_tower_dc_1[0], weight='length')
-                red_path_stretch = ((dist_fiber / 200) + (red_path_length / 300)) / (geo_dist_dc / 300)
-                if red_path_stretch < 1.05:
-                    path_diversity_counter += 1
-            except:
-                pass
-        path_diversity = path_diversity_counter/(len(path) - 1)
-
-        link_lens = []
-        frequencies = []
-        for i in range(0, len(path) - 1):
-            link_lens.append(G2[path[i]][path[i + 1]]['length'])
-            list = G2[path[i]][path[i + 1]]['frequency_list']
-            for elem in list:
-                try:
-                    freq = float(elem.replace("'", ""))
-                    frequencies.append(freq)
-                except:
-                    pass
-        link_lens.sort()
-        frequencies.sort()
-        median_link_len = link_lens[math.floor(len(link_lens) / 2)]
-        median_freq = frequencies[math.floor(len(frequencies) / 2)]
-
-        # if dist_fiber < 10.0:
-        print(date, geo_dist_dc, path_length, dist_fiber, stretch, stretch_aggr, simple_path_counter)
-        wr.write(date
-                 + "," + str(geo_dist_dc)
-                 + "," + str(path_length)
-                 + "," + str(dist_fiber)
-                 + "," + str(stretch)
-                 + "," + str(stretch_aggr)
-                 + "," + str(simple_path_counter)
-                 + "," + str(median_link_len)
-                 + "," + str(median_freq)
-                 + "," + str(path_diversity)
-                 + "\n")
-
-
-# Iterate for all entities in the list
-for entity in ENTITY_NAMES:
-    corr_name = entity.replace(" ", "_").replace("/", "_").replace(".", "_").replace(",", "_").replace("&", "_")
-    OUT_FILE = TEMPORAL_DIR + corr_name + ".txt"
-    writer = open(OUT_FILE, 'w')
-    for snapshot in SNAPSHOT_DATES:
-        IN_FILE_GRAPH = OUTPUT_DIR + corr_name.replace(" ", "_")+"/"+snapshot+"/graph_active.yaml"
-        #find_e2e_latency()
         try:
-            G = nx.read_yaml(IN_FILE_GRAPH)
-            find_inter_DC_min_lat(writer, snapshot)
+            lines[dc_id] = find_DC_pair_min_lat(date, G2, dc_id, min_stretch_paths[dc_id])
         except:
-            #traceback.print_exc()
-            writer.write(snapshot + ",,,,,,,,\n")
+            lines[dc_id] = get_empty_line(date)
+    return lines
 
-    writer.close()
+
+def find_DC_pair_min_lat(date, G2, dc_id, min_stretch_path):
+    """
+    Gets the latency metrics between CME and an exchange from the minimum stretch path between them
+    :param date: Date of reconstruction
+    :param G2: Undirected graph
+    :param dc_id: Exchange data center ID
+    :param min_stretch_path: Source tower, destination tower, fiber distance, path, path length and latency
+    :return: Output line
+    """
+    nearest_tower_dc_0, nearest_tower_dc_1, min_dist_fiber, path, path_length, latency_us = min_stretch_path
+    geo_dist_towers = util.compute_length_ground(nearest_tower_dc_0[1], nearest_tower_dc_1[1])
+    geo_dist_dc = util.compute_length_ground(DC[0], DC[dc_id])
+    stretch = path_length / geo_dist_towers
+    dist_fiber = min_dist_fiber
+
+    stretch_aggr = latency.compute_stretch(latency_us, geo_dist_dc)
+
+    # Paths with stretch < 1.05, bounding their latencies as radio distances including the hop delays
+    max_p_len = 1.05 * geo_dist_dc - dist_fiber * latency.get_fiber_factor()
+    simple_path_counter = latency.find_near_optimal_paths_summary(
+        G2, nearest_tower_dc_0[0], nearest_tower_dc_1[0], max_p_len, latency.LATENCY_WEIGHT)[0]
+
+    path_diversity_counter = 0
+    replacement_lengths = latency.find_replacement_path_lengths(G2, path, latency.LATENCY_WEIGHT)
+    for red_path_length in replacement_lengths:
+        # The replacement lengths include the hop delays
+        red_path_stretch = latency.compute_stretch(latency.compute_latency(dist_fiber, red_path_length, 0), geo_dist_dc)
+        if red_path_stretch < 1.05:
+            path_diversity_counter += 1
+    path_diversity = path_diversity_counter / (len(path) - 1)
+
+    link_lens, frequencies = latency.get_link_arrays(G2, list(zip(path[:-1], path[1:])))
+    median_link_len = latency.get_upper_median(link_lens)
+    median_freq = latency.get_upper_median(frequencies)
+
+    # if dist_fiber < 10.0:
+    print(date, geo_dist_dc, path_length, dist_fiber, stretch, stretch_aggr, simple_path_counter, latency_us)
+    return (date
+            + "," + str(geo_dist_dc)
+            + "," + str(path_length)
+            + "," + str(dist_fiber)
+            + "," + str(stretch)
+            + "," + str(stretch_aggr)
+            + "," + str(simple_path_counter)
+            + "," + str(median_link_len)
+            + "," + str(median_freq)
+            + "," + str(path_diversity)
+            + "," + str(latency_us)
+            + "\n")
+
+
+def find_snapshot_latencies(job):
+    """
+    Gets the latencies between CME and the exchanges over the network of an entity on a date;
+    run by the worker processes
+    :param job: (Entity name, date)
+    :return: Dictionary of exchange data center ID -> output line, run time (s)
+    """
+    corr_name, snapshot = job
+    start = time.time()
+    IN_DIR_GRAPH = OUTPUT_DIR + corr_name.replace(" ", "_") + "/" + snapshot
+    try:
+        G = graph_snapshot.read_graph(IN_DIR_GRAPH)
+        lines = find_inter_DC_min_lat(G, snapshot)
+    except:
+        #traceback.print_exc()
+        lines = {}
+        for dc_id in range(1, len(DC)):
+            lines[dc_id] = get_empty_line(snapshot)
+    return lines, time.time() - start
+
+
+if __name__ == "__main__":
+    # Iterate for all entities in the list
+    for dc_id in range(1, len(DC)):
+        os.makedirs(TEMPORAL_DIR[dc_id], exist_ok=True)
+    corr_names = []
+    for entity in ENTITY_NAMES:
+        corr_names.append(license_data.get_corr_name(entity))
+    jobs = [(corr_name, snapshot) for corr_name in corr_names for snapshot in SNAPSHOT_DATES]
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=LATENCY_WORKERS) as executor:
+        # Results come in job order, so the output does not depend on LATENCY_WORKERS
+        results = executor.map(find_snapshot_latencies, jobs)
+        for corr_name in corr_names:
+            writers = {}
+            for dc_id in range(1, len(DC)):
+                writers[dc_id] = open(TEMPORAL_DIR[dc_id] + corr_name + ".txt", 'w')
+            for snapshot in SNAPSHOT_DATES:
+                lines, run_time = next(results)
+                print("Job", corr_name, snapshot, "%.3f s" % run_time)
+                for dc_id in writers:
+                    writers[dc_id].write(lines[dc_id])
+            for dc_id in writers:
+                writers[dc_id].close()
+    print("Total", "%.3f s" % (time.time() - start))
@@ -0,0 +1,291 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Compact binary graph snapshots (graph_active.bin) replacing YAML dumps of networkx graphs.
+A snapshot holds node coordinate arrays, edges in CSR form (per-node offsets into target/length arrays),
+link frequencies (MHz) in CSR form (per-edge offsets into a frequency array) and an interned elevation
+table. Graphs whose edges carry 'owners' (e.g. the corridor graph) also hold the owners of each edge in
+CSR form, as indices into an interned owner table. The arrays are memory-mapped when a snapshot is read.
+Run as a script to convert existing graph_active.yaml files under OUTPUT_DIR
+"""
+
+import json
+import os
+import struct
+import time
+import networkx as nx
+import numpy as np
+import yaml
+
+try:
+    from . import license_data
+except (ImportError, SystemError):
+    import license_data
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Snapshot file names
+SNAPSHOT_FILE = "graph_active.bin"
+YAML_FILE = "graph_active.yaml"
+
+MAGIC = b"HFTG"
+VERSION = 2
+ALIGNMENT = 64
+
+
+class Snapshot:
+    """
+    Graph snapshot backed by (memory-mapped) arrays
+    """
+
+    def __init__(self, arrays, elevations, owners=None):
+        self.node_id = arrays["node_id"]
+        self.lat_deg = arrays["lat_deg"]
+        self.long_deg = arrays["long_deg"]
+        self.elevation = arrays["elevation"]
+        self.edge_offsets = arrays["edge_offsets"]
+        self.edge_target = arrays["edge_target"]
+        self.length = arrays["length"]
+        self.frequency_offsets = arrays["frequency_offsets"]
+        self.frequency = arrays["frequency"]
+        self.elevations = elevations
+        # Owner table, and per-edge offsets into the owner index array; None if edges have no owners
+        self.owners = owners
+        self.owner_offsets = arrays.get("owner_offsets")
+        self.owner = arrays.get("owner")
+
+    def number_of_nodes(self):
+        return len(self.node_id)
+
+    def number_of_edges(self):
+        return len(self.edge_target)
+
+    def to_graph(self):
+        """
+        Builds the networkx graph of the snapshot
+        :return: Directed graph with the node and edge attributes of the original graph
+        """
+        grph = nx.DiGraph()
+        node_ids = self.node_id.tolist()
+        elevation = self.elevation.tolist()
+        for u, lat_deg, long_deg, elev in zip(node_ids, self.lat_deg.tolist(), self.long_deg.tolist(), elevation):
+            grph.add_node(u, lat_deg=lat_deg, long_deg=long_deg, elevation=self.elevations[elev])
+        edge_offsets = self.edge_offsets.tolist()
+        edge_target = self.edge_target.tolist()
+        length = self.length.tolist()
+        frequency_offsets = self.frequency_offsets.tolist()
+        frequency = self.frequency.tolist()
+        for k in range(len(node_ids)):
+            for e in range(edge_offsets[k], edge_offsets[k + 1]):
+                grph.add_edge(node_ids[k], node_ids[edge_target[e]],
+                              frequency_list=frequency[frequency_offsets[e]:frequency_offsets[e + 1]],
+                              length=length[e])
+        if self.owners is not None:
+            owner_offsets = self.owner_offsets.tolist()
+            owner = self.owner.tolist()
+            for k in range(len(node_ids)):
+                for e in range(edge_offsets[k], edge_offsets[k + 1]):
+                    grph[node_ids[k]][node_ids[edge_target[e]]]['owners'] = \
+                        [self.owners[i] for i in owner[owner_offsets[e]:owner_offsets[e + 1]]]
+        return grph
+
+
+def write_snapshot(grph, path):
+    """
+    Writes a graph as a binary snapshot
+    :param grph: Directed graph with lat_deg/long_deg/elevation node and frequency_list (MHz)/length edge attributes,
+    and optionally owners edge attributes (lists of entity names) on all edges
+    :param path: Snapshot file
+    :return: None
+    """
+    node_ids = list(grph.nodes)
+    position = {u: k for k, u in enumerate(node_ids)}
+    elevations = []
+    elevation_index = {}
+    elevation = []
+    edge_offsets = [0]
+    edge_target = []
+    length = []
+    frequency_offsets = [0]
+    frequency = []
+    has_owners = any('owners' in data for u, v, data in grph.edges(data=True))
+    owners = []
+    owner_index = {}
+    owner_offsets = [0]
+    owner = []
+    for u in node_ids:
+        elev = grph.nodes[u]["elevation"]
+        if elev not in elevation_index:
+            elevation_index[elev] = len(elevations)
+            elevations.append(elev)
+        elevation.append(elevation_index[elev])
+        for v, data in grph.adj[u].items():
+            edge_target.append(position[v])
+            length.append(data["length"])
+            frequency.extend(data["frequency_list"])
+            frequency_offsets.append(len(frequency))
+            if has_owners:
+                for corr_name in data["owners"]:
+                    if corr_name not in owner_index:
+                        owner_index[corr_name] = len(owners)
+                        owners.append(corr_name)
+                    owner.append(owner_index[corr_name])
+                owner_offsets.append(len(owner))
+        edge_offsets.append(len(edge_target))
+    arrays = {
+        "node_id": np.array(node_ids, dtype=np.int64),
+        "lat_deg": np.array([grph.nodes[u]["lat_deg"] for u in node_ids], dtype=np.float64),
+        "long_deg": np.array([grph.nodes[u]["long_deg"] for u in node_ids], dtype=np.float64),
+        "elevation": np.array(elevation, dtype=np.int32),
+        "edge_offsets": np.array(edge_offsets, dtype=np.int64),
+        "edge_target": np.array(edge_target, dtype=np.int32),
+        "length": np.array(length, dtype=np.float64),
+        "frequency_offsets": np.array(frequency_offsets, dtype=np.int64),
+        "frequency": np.array(frequency, dtype=np.float64),
+    }
+    if has_owners:
+        arrays["owner_offsets"] = np.array(owner_offsets, dtype=np.int64)
+        arrays["owner"] = np.array(owner, dtype=np.int32)
+
+    # Layout: magic, header length, JSON header, then arrays at ALIGNMENT-byte boundaries
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, len(array), offset]
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = {
+        "version": VERSION,
+        "arrays": layout,
+        "elevations": elevations
+    }
+    if has_owners:
+        header["owners"] = owners
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][2])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+
+def read_snapshot(path):
+    """
+    Reads a binary snapshot, memory-mapping its arrays
+    :param path: Snapshot file
+    :return: Snapshot
+    :raises ValueError: if the file is not a snapshot of the current VERSION
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a graph snapshot: " + path)
+        header_length = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    if header["version"] != VERSION:
+        raise ValueError("Unsupported graph snapshot version: " + str(header["version"]))
+    data_start = -(-(len(MAGIC) + 4 + header_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for name, (dtype, count, offset) in header["arrays"].items():
+        if count == 0:
+            arrays[name] = np.zeros(0, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=data_start + offset, shape=(count,))
+    return Snapshot(arrays, header["elevations"], header.get("owners"))
+
+
+def write_graph(grph, directory, write_yaml=False):
+    """
+    Writes the graph of a snapshot directory
+    :param grph: Directed graph
+    :param directory: Snapshot directory (e.g. OUTPUT_DIR/<entity>/<mm_dd_yyyy>)
+    :param write_yaml: Whether to also write the human-readable YAML graph
+    :return: None
+    """
+    write_snapshot(grph, os.path.join(directory, SNAPSHOT_FILE))
+    if write_yaml:
+        write_yaml_graph(grph, os.path.join(directory, YAML_FILE))
+
+
+def write_yaml_graph(grph, path):
+    """
+    Writes a graph as YAML, in the format of networkx's write_yaml (removed in networkx 3)
+    :param grph: Directed graph
+    :param path: YAML file
+    :return: None
+    """
+    with open(path, 'w') as f:
+        yaml.dump(grph, f)
+
+
+def read_yaml_graph(path):
+    """
+    Reads a YAML graph written by write_yaml_graph or networkx's write_yaml, converting frequency
+    strings (e.g. '006123.10000000') to MHz. The file holds Python object tags, so it must be trusted
+    :param path: YAML file
+    :return: Directed graph
+    """
+    with open(path, 'r') as f:
+        grph = yaml.load(f, Loader=yaml.UnsafeLoader)
+    for u, v, data in grph.edges(data=True):
+        data['frequency_list'] = license_data.parse_frequencies([str(f) for f in data['frequency_list']])
+    return grph
+
+
+def read_graph(directory):
+    """
+    Reads the graph of a snapshot directory, from the binary snapshot if there is one, or from YAML
+    :param directory: Snapshot directory (e.g. OUTPUT_DIR/<entity>/<mm_dd_yyyy>)
+    :return: Directed graph
+    :raises IOError: if the directory has no graph file
+    :raises ValueError: if the graph file cannot be read (truncated, corrupt or not a graph)
+    """
+    path = os.path.join(directory, SNAPSHOT_FILE)
+    try:
+        if os.path.exists(path):
+            return read_snapshot(path).to_graph()
+        path = os.path.join(directory, YAML_FILE)
+        return read_yaml_graph(path)
+    except (struct.error, yaml.YAMLError, AttributeError, KeyError, TypeError, IndexError) as e:
+        raise ValueError("Unreadable graph: " + path + ": " + str(e)) from e
+
+
+def convert_yaml_snapshots():
+    """
+    Converts all graph_active.yaml files under OUTPUT_DIR which have no binary snapshot yet
+    :return: None
+    """
+    for dirpath, dirnames, filenames in sorted(os.walk(OUTPUT_DIR)):
+        start = time.time()
+        if SNAPSHOT_FILE in filenames or YAML_FILE not in filenames:
+            continue
+        grph = read_yaml_graph(os.path.join(dirpath, YAML_FILE))
+        write_snapshot(grph, os.path.join(dirpath, SNAPSHOT_FILE))
+        print(dirpath, grph.number_of_nodes(), grph.number_of_edges(), time.time() - start)
+
+
+if __name__ == "__main__":
+    convert_yaml_snapshots()
@@ -0,0 +1,320 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Fetches FCC Web pages over a shared keep-alive session with a per-host concurrency limit,
+a polite rate limiter and retries with exponential backoff.
+Responses are kept in an on-disk cache keyed by URL, revalidated with ETag/Last-Modified
+once they are older than CACHE_TTL, and evicted least recently used first beyond CACHE_MAX_BYTES
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+# Maximum number of in-flight requests to a single host
+MAX_CONNECTIONS_PER_HOST = 8
+
+# Maximum number of requests started per second towards a single host
+REQUESTS_PER_SECOND = 10.0
+
+# Connect and read timeouts (in seconds) of a request
+REQUEST_TIMEOUT = (10, 60)
+
+# Number of retries of a failed request; retry i waits BACKOFF_FACTOR * 2^i seconds
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0
+
+# Response status codes which are retried
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Directory of the on-disk response cache; empty disables caching
+CACHE_DIR = os.environ.get("FCC_CACHE_DIR", "../http_cache/")
+
+# Age (in seconds) below which a cached response is used without contacting the server
+CACHE_TTL = 30 * 24 * 3600
+
+# Maximum total size (in bytes) of cached responses
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+hosts = {}
+hosts_lock = threading.Lock()
+
+session = None
+session_lock = threading.Lock()
+
+# Cache key -> [size, last access time]; loaded from CACHE_DIR on first use
+cache_index = None
+cache_size = 0
+cache_lock = threading.Lock()
+
+
+class RateLimiter:
+    """
+    Spaces out requests so that at most `rate` of them start per second
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next request slot is available
+        :return: None
+        """
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_host_limits(host):
+    """
+    Gets the semaphore and rate limiter shared by all requests to a host
+    :param host: Host name (with port, if any)
+    :return: Semaphore and rate limiter for the host
+    """
+    with hosts_lock:
+        if host not in hosts:
+            hosts[host] = (threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST),
+                           RateLimiter(REQUESTS_PER_SECOND))
+        return hosts[host]
+
+
+def cache_path(key):
+    """
+    Gets the path of a cached response body; its metadata is stored next to it with a .json suffix
+    :param key: Cache key
+    :return: Path of the cached body
+    """
+    return os.path.join(CACHE_DIR, key[:2], key)
+
+
+def load_cache_index():
+    """
+    Scans CACHE_DIR once to learn the size and last access time of each cached response
+    :return: None; cache_index and cache_size are set
+    """
+    global cache_index, cache_size
+    cache_index = {}
+    cache_size = 0
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for subdir in os.scandir(CACHE_DIR):
+        if not subdir.is_dir():
+            continue
+        for entry in os.scandir(subdir.path):
+            if entry.name.endswith(".json") or entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            cache_index[entry.name] = [stat.st_size, stat.st_mtime]
+            cache_size += stat.st_size
+
+
+def cache_lookup(key):
+    """
+    Reads the metadata of a cached response
+    :param key: Cache key
+    :return: Metadata dictionary, or None if the response is not cached
+    """
+    with cache_lock:
+        if cache_index is None:
+            load_cache_index()
+        if key not in cache_index:
+            return None
+    try:
+        with open(cache_path(key) + ".json", 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_read(key):
+    """
+    Reads a cached response body and marks it as recently used
+    :param key: Cache key
+    :return: Page text
+    """
+    path = cache_path(key)
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    now = time.time()
+    with cache_lock:
+        if key in cache_index:
+            cache_index[key][1] = now
+    try:
+        os.utime(path, (now, now))
+    except OSError:
+        pass
+    return text
+
+
+def write_atomic(path, data):
+    """
+    Writes a file through a temporary file so that readers never see partial content
+    :param path: File path
+    :param data: Text to write
+    :return: None
+    """
+    tmp_path = path + "." + str(threading.get_ident()) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def cache_store(key, meta, text=None):
+    """
+    Stores the metadata and, if given, the body of a response, evicting least recently used responses
+    :param key: Cache key
+    :param meta: Metadata dictionary (URL, ETag, Last-Modified, fetch time, tag)
+    :param text: Page text; None keeps the cached body
+    :return: None
+    """
+    global cache_size
+    path = cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if text is not None:
+        write_atomic(path, text)
+    write_atomic(path + ".json", json.dumps(meta))
+    size = os.path.getsize(path)
+    evicted = []
+    with cache_lock:
+        if key in cache_index:
+            cache_size -= cache_index[key][0]
+        cache_index[key] = [size, time.time()]
+        cache_size += size
+        if cache_size > CACHE_MAX_BYTES:
+            for old_key in sorted(cache_index, key=lambda k: cache_index[k][1]):
+                if cache_size <= 0.9 * CACHE_MAX_BYTES:
+                    break
+                if old_key == key:
+                    continue
+                cache_size -= cache_index.pop(old_key)[0]
+                evicted.append(old_key)
+    for old_key in evicted:
+        for old_path in (cache_path(old_key), cache_path(old_key) + ".json"):
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+
+def get_session():
+    """
+    Gets the session shared by all threads, whose connection pool keeps connections alive across requests
+    :return: Session
+    """
+    global session
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=MAX_CONNECTIONS_PER_HOST)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        return session
+
+
+def http_get(url, headers):
+    """
+    Issues a GET request, waiting for a free connection slot and rate limiter token of its host.
+    Connection errors, timeouts and RETRY_STATUS_CODES are retried with exponential backoff
+    :param url: Page URL
+    :param headers: Request headers
+    :return: Response
+    :raises requests.RequestException: if the request still fails after MAX_RETRIES retries
+    """
+    semaphore, limiter = get_host_limits(urlparse(url).netloc)
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with semaphore:
+                limiter.wait()
+                resp = get_session().get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+            if resp.status_code not in RETRY_STATUS_CODES:
+                resp.raise_for_status()
+                return resp
+            error = requests.HTTPError(str(resp.status_code) + " Server Error for url: " + url, response=resp)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        if attempt < MAX_RETRIES:
+            print("Retrying", url, "after", error)
+            time.sleep(BACKOFF_FACTOR * math.pow(2, attempt))
+    raise error
+
+
+def fetch(url, tag=None, ttl=None):
+    """
+    Gets a Web page, from the on-disk cache if possible.
+    A cached response is used as is if it is younger than the TTL and was stored with the same tag;
+    otherwise it is revalidated with a conditional request
+    :param url: Page URL
+    :param tag: Caller-defined version of the page (e.g. license status); a changed tag makes the response stale
+    :param ttl: Maximum age (in seconds) of a cached response used without revalidation; CACHE_TTL by default
+    :return: Page text
+    :raises requests.RequestException: if the page cannot be downloaded
+    """
+    if not CACHE_DIR:
+        return http_get(url, {}).text
+    if ttl is None:
+        ttl = CACHE_TTL
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    meta = cache_lookup(key)
+    headers = {}
+    if meta is not None:
+        if meta["tag"] == tag and time.time() - meta["fetched"] < ttl:
+            try:
+                return cache_read(key)
+            except OSError:
+                meta = None
+        else:
+            if meta["etag"]:
+                headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                headers["If-Modified-Since"] = meta["last_modified"]
+    resp = http_get(url, headers)
+    if meta is not None and resp.status_code == 304:
+        try:
+            text = cache_read(key)
+            meta["fetched"] = time.time()
+            meta["tag"] = tag
+            cache_store(key, meta)
+            return text
+        except OSError:
+            resp = http_get(url, {})
+    if resp.status_code == 200:
+        cache_store(key, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched": time.time(),
+            "tag": tag
+        }, resp.text)
+    return resp.text
@@ -0,0 +1,422 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Shared latency computations of the end-to-end latency scripts
+"""
+
+import itertools
+import math
+import networkx as nx
+import numpy as np
+
+try:
+    from . import util
+except (ImportError, SystemError):
+    import util
+
+# Data centers have fiber connectivity with towers within this radius (km)
+NEARBY_RADIUS = 50.0
+
+# Speed of light in vacuum (km per ms)
+SPEED_OF_LIGHT = 299.792458
+
+# Refractive indices of the fiber between data centers and towers (group index of standard single-mode
+# fiber) and of the air along the microwave links; signal speeds are derived from them when used
+# (see get_fiber_speed and get_radio_speed), so they can be changed at run time
+FIBER_REFRACTIVE_INDEX = 1.4682
+AIR_REFRACTIVE_INDEX = 1.0003
+
+# Radio and regeneration delay (microseconds) of every microwave link; the default of all hop_delay parameters
+HOP_DELAY = 1.0
+
+# Edge attribute holding the latency of a link as an equivalent radio distance (km): its length
+# plus the distance covered at the radio speed during the hop delay. Shortest paths are ranked by it
+LATENCY_WEIGHT = "latency_length"
+
+# Slack (km) of the lower bounds used to prune the enumeration of near-optimal paths, so that
+# rounding differences between the bounds and the path lengths never prune a near-optimal path
+BOUND_TOLERANCE = 1e-9
+
+# Virtual node attached to the towers near the source data center
+SUPER_SOURCE = "super_source"
+
+# Data centers in the Chicago - NJ corridor; add sites here to include them in the latency scripts
+DATA_CENTERS = {
+    "cme": {"lat_deg": 41.7965645, "long_deg": -88.243012},  # CME CyrusOne
+    "ny4": {"lat_deg": 40.7772608, "long_deg": -74.071748},  # NY4
+    "nyse": {"lat_deg": 41.0783577, "long_deg": -74.1529141},  # NYSE
+    "nasdaq": {"lat_deg": 40.5843303, "long_deg": -74.2434266}  # NASDAQ
+}
+
+
+def get_data_centers(names):
+    """
+    Builds the data centers dictionary used by the latency scripts from DATA_CENTERS
+    :param names: List of data center names; DC[0] is the first one
+    :return: Dictionary of data center ID -> data center with lat/long in degrees and radians and name
+    """
+    dcs = {}
+    for id in range(len(names)):
+        dc = DATA_CENTERS[names[id]]
+        dcs[id] = {
+            "lat_deg": dc["lat_deg"],
+            "lat_rad": math.radians(dc["lat_deg"]),
+            "long_deg": dc["long_deg"],
+            "long_rad": math.radians(dc["long_deg"]),
+            "name": names[id]
+        }
+    return dcs
+
+
+def get_link_arrays(grph, links):
+    """
+    Gets the lengths and the frequencies of links
+    :param grph: Graph with 'length' and 'frequency_list' (MHz) edge attributes
+    :param links: List of (node ID, node ID)
+    :return: Array of the link lengths (km), array of the frequencies (MHz) of all links, in link order
+    """
+    lengths = np.array([grph[u][v]['length'] for u, v in links], dtype=np.float64)
+    frequencies = np.fromiter(itertools.chain.from_iterable(grph[u][v]['frequency_list'] for u, v in links),
+                              dtype=np.float64)
+    return lengths, frequencies
+
+
+def get_upper_median(values):
+    """
+    Gets the median of values as reported by the latency scripts, i.e. the upper one of the two middle values
+    :param values: Non-empty array
+    :return: Element floor(n / 2) of the sorted values
+    """
+    return float(np.partition(values, len(values) // 2)[len(values) // 2])
+
+
+def get_fiber_speed():
+    """
+    Gets the signal speed over fiber
+    :return: Speed (km per ms) of light in fiber with FIBER_REFRACTIVE_INDEX
+    """
+    return SPEED_OF_LIGHT / FIBER_REFRACTIVE_INDEX
+
+
+def get_radio_speed():
+    """
+    Gets the signal speed over the microwave links
+    :return: Speed (km per ms) of light in air with AIR_REFRACTIVE_INDEX
+    """
+    return SPEED_OF_LIGHT / AIR_REFRACTIVE_INDEX
+
+
+def get_fiber_factor():
+    """
+    Gets the factor converting fiber distances into radio distances with the same latency
+    :return: Radio speed / fiber speed
+    """
+    return get_radio_speed() / get_fiber_speed()
+
+
+def get_hop_length(hop_delay=None):
+    """
+    Gets the radio distance equivalent to a hop delay
+    :param hop_delay: Delay (microseconds); HOP_DELAY if None
+    :return: Distance (km) covered at the radio speed during the delay
+    """
+    if hop_delay is None:
+        hop_delay = HOP_DELAY
+    return hop_delay / 1000 * get_radio_speed()
+
+
+def set_latency_weights(grph, hop_delay=None):
+    """
+    Folds the hop delay into the edge weights used to rank paths by latency
+    :param grph: Graph with 'length' edge attributes
+    :param hop_delay: Delay (microseconds) of every link; HOP_DELAY if None
+    :return: None; the LATENCY_WEIGHT edge attribute is set
+    """
+    hop_length = get_hop_length(hop_delay)
+    for u, v, data in grph.edges(data=True):
+        data[LATENCY_WEIGHT] = data['length'] + hop_length
+
+
+def compute_latency(dist_fiber, path_length, hop_count, hop_delay=None):
+    """
+    Computes the one-way latency between two data centers
+    :param dist_fiber: Fiber distance (km) between the data centers and the towers
+    :param path_length: Length (km) of the microwave path
+    :param hop_count: Number of links of the path
+    :param hop_delay: Delay (microseconds) of every link; HOP_DELAY if None
+    :return: Latency (microseconds)
+    """
+    if hop_delay is None:
+        hop_delay = HOP_DELAY
+    return (dist_fiber / get_fiber_speed() + path_length / get_radio_speed()) * 1000 + hop_count * hop_delay
+
+
+def compute_stretch(latency_us, geo_dist):
+    """
+    Computes the aggregate stretch of a latency, i.e. its ratio to the latency of a straight microwave
+    link without hop delay
+    :param latency_us: Latency (microseconds)
+    :param geo_dist: Geodesic distance (km) between the data centers
+    :return: Aggregate stretch
+    """
+    return latency_us / (geo_dist / get_radio_speed() * 1000)
+
+
+def find_nearby_towers(grph, dcs, radius=NEARBY_RADIUS):
+    """
+    Finds the towers within a radius of each data center, computing the distances between all towers
+    and all data centers at once. Also sets the lat_rad/long_rad attributes of the towers
+    :param grph: Graph whose nodes have lat_deg/long_deg attributes
+    :param dcs: Dictionary of data center ID -> data center with lat_rad/long_rad
+    :param radius: Radius (km)
+    :return: Dictionaries of data center ID -> list of nearby (node ID, node data) in graph node order,
+    and data center ID -> list of the corresponding distances (km)
+    """
+    nearby_towers = {}
+    tower_dists = {}
+    for id in dcs:
+        nearby_towers[id] = []
+        tower_dists[id] = []
+    nodes = list(grph.nodes(data=True))
+    if not nodes:
+        return nearby_towers, tower_dists
+    lat_rad = np.radians(np.array([float(node[1]['lat_deg']) for node in nodes]))
+    long_rad = np.radians(np.array([float(node[1]['long_deg']) for node in nodes]))
+    for node, node_lat_rad, node_long_rad in zip(nodes, lat_rad.tolist(), long_rad.tolist()):
+        node[1]["lat_rad"] = node_lat_rad
+        node[1]["long_rad"] = node_long_rad
+    dc_ids = list(dcs)
+    tower_xyz = util.compute_ecef(lat_rad, long_rad)
+    dc_xyz = util.compute_ecef([dcs[id]["lat_rad"] for id in dc_ids], [dcs[id]["long_rad"] for id in dc_ids])
+    # Distances between all data centers (rows) and towers (columns)
+    dists = np.sqrt(((dc_xyz[:, np.newaxis, :] - tower_xyz[np.newaxis, :, :]) ** 2).sum(axis=2))
+    for row, id in enumerate(dc_ids):
+        for k in np.flatnonzero(dists[row] < radius).tolist():
+            nearby_towers[id].append(nodes[k])
+            tower_dists[id].append(float(dists[row, k]))
+    return nearby_towers, tower_dists
+
+
+def find_min_stretch_paths(grph, src_towers, src_dists, dsts, hop_delay=None):
+    """
+    Finds, for each destination data center, the pair of towers near the source and the destination
+    data centers and the path between them with the minimum latency ((fiber distance / fiber speed) +
+    (path length / radio speed) + hop delays). The hop delay is folded into the LATENCY_WEIGHT of the
+    edges, which this sets, and a super source is attached to the source towers with edges weighted
+    by the fiber distances scaled to the radio speed, so a single shortest path tree serves all
+    destinations. The virtual node is removed from the graph before returning
+    :param grph: Undirected graph with 'length' edge attributes
+    :param src_towers: List of (node ID, node data) near the source data center
+    :param src_dists: List of the corresponding distances (km)
+    :param dsts: Dictionary of destination data center ID -> (list of (node ID, node data) near it,
+    list of the corresponding distances (km))
+    :param hop_delay: Delay (microseconds) of every link; HOP_DELAY if None
+    :return: Dictionary of destination data center ID -> (source tower, destination tower, fiber
+    distance (km), path between the towers, path length (km), latency (microseconds)); destinations
+    to which no pair of towers is connected are left out
+    """
+    set_latency_weights(grph, hop_delay)
+    fiber_factor = get_fiber_factor()
+    src_index = {}
+    grph.add_node(SUPER_SOURCE)
+    try:
+        for k in range(len(src_towers)):
+            src_index[src_towers[k][0]] = k
+            grph.add_edge(SUPER_SOURCE, src_towers[k][0], **{LATENCY_WEIGHT: src_dists[k] * fiber_factor})
+        lengths, paths = nx.single_source_dijkstra(grph, SUPER_SOURCE, weight=LATENCY_WEIGHT)
+    finally:
+        grph.remove_node(SUPER_SOURCE)
+    results = {}
+    for dst_id in dsts:
+        dst_towers, dst_dists = dsts[dst_id]
+        id2 = None
+        min_length = None
+        for k in range(len(dst_towers)):
+            if dst_towers[k][0] not in lengths:
+                continue
+            length = lengths[dst_towers[k][0]] + dst_dists[k] * fiber_factor
+            if id2 is None or length < min_length:
+                id2 = k
+                min_length = length
+        if id2 is None:
+            continue
+        path = paths[dst_towers[id2][0]][1:]
+        path_length = 0
+        for i in range(len(path) - 1):
+            path_length += grph[path[i]][path[i + 1]]['length']
+        id1 = src_index[path[0]]
+        dist_fiber = src_dists[id1] + dst_dists[id2]
+        results[dst_id] = (src_towers[id1], dst_towers[id2], dist_fiber, path, path_length,
+                           compute_latency(dist_fiber, path_length, len(path) - 1, hop_delay))
+    return results
+
+
+def _shortest_path_tree_branches(grph, root, path, weight='length'):
+    """
+    Computes the distances from the root and, for every node, the index of the path vertex at which
+    its branch leaves the path in a shortest path tree of the root containing the path
+    :param grph: Undirected graph with weight edge attributes
+    :param root: Root node; path[0]
+    :param path: Shortest path starting at the root
+    :param weight: Edge attribute of the lengths
+    :return: Dictionary of node -> distance from the root, dictionary of node -> path index
+    """
+    preds, dists = nx.dijkstra_predecessor_and_distance(grph, root, weight=weight)
+    branch = {}
+    for i in range(len(path)):
+        branch[path[i]] = i
+    for node in dists:
+        trail = []
+        while node not in branch:
+            trail.append(node)
+            node = preds[node][0]
+        for n in trail:
+            branch[n] = branch[node]
+    return dists, branch
+
+
+def find_replacement_path_lengths(grph, path, weight='length'):
+    """
+    Finds, for every edge of a shortest path, the length of the shortest path between its end
+    points avoiding that edge, without copying the graph. With shortest path trees from both end
+    points containing the path, the best detour around path edge i enters a non-path edge (u, w)
+    with u branching off the path at or before vertex i in the source tree and w joining it at or
+    after vertex i + 1 in the destination tree; candidates are assigned in increasing length order
+    :param grph: Undirected graph with weight edge attributes
+    :param path: Shortest path (list of node IDs)
+    :param weight: Edge attribute of the lengths, e.g. LATENCY_WEIGHT for paths ranked by latency
+    :return: List of replacement path lengths of the path edges; math.inf if an edge is a bridge
+    """
+    num_edges = len(path) - 1
+    src_dists, src_branch = _shortest_path_tree_branches(grph, path[0], path, weight)
+    dst_dists, dst_branch = _shortest_path_tree_branches(grph, path[-1], path[::-1], weight)
+    path_edges = set()
+    for i in range(num_edges):
+        path_edges.add((path[i], path[i + 1]))
+        path_edges.add((path[i + 1], path[i]))
+    candidates = []
+    for u, w, length in grph.edges(data=weight):
+        if (u, w) in path_edges or u not in src_dists or w not in src_dists:
+            continue
+        for a, b in ((u, w), (w, u)):
+            first = src_branch[a]
+            last = num_edges - dst_branch[b]  # path edges first .. last - 1 are avoided
+            if first < last:
+                candidates.append((src_dists[a] + length + dst_dists[b], first, last))
+    candidates.sort()
+    replacement_lengths = [math.inf] * num_edges
+    # next_free[i] is the first path edge at or after i without a replacement length yet
+    next_free = list(range(num_edges + 1))
+
+    def find_free(i):
+        root = i
+        while next_free[root] != root:
+            root = next_free[root]
+        while next_free[i] != root:
+            next_free[i], i = root, next_free[i]
+        return root
+
+    for length, first, last in candidates:
+        i = find_free(first)
+        while i < last:
+            replacement_lengths[i] = length
+            next_free[i] = i + 1
+            i = find_free(i + 1)
+    return replacement_lengths
+
+
+def _iter_bounded_paths(grph, src, dst, max_length, weight='length'):
+    """
+    Enumerates the simple paths shorter than max_length by depth-first search, pruning partial paths
+    whose length plus the shortest distance from their last node to the destination is too long
+    :param grph: Undirected graph with weight edge attributes
+    :param src: Source node
+    :param dst: Destination node
+    :param max_length: Length bound; the paths are strictly shorter
+    :param weight: Edge attribute of the lengths
+    :return: Generator of (path, path length); the yielded path list is modified after the next step
+    """
+    dst_dists = nx.single_source_dijkstra_path_length(grph, dst, weight=weight)
+    if src not in dst_dists or dst_dists[src] >= max_length + BOUND_TOLERANCE:
+        return
+    path = [src]
+    on_path = {src}
+    lengths = [0]
+    neighbors = [iter(grph[src].items())]
+    while neighbors:
+        for nbr, attrs in neighbors[-1]:
+            if nbr in on_path:
+                continue
+            length = lengths[-1] + attrs[weight]
+            if length + dst_dists[nbr] >= max_length + BOUND_TOLERANCE:
+                continue
+            if nbr == dst:
+                if length < max_length:
+                    path.append(dst)
+                    yield path, length
+                    path.pop()
+                continue
+            path.append(nbr)
+            on_path.add(nbr)
+            lengths.append(length)
+            neighbors.append(iter(grph[nbr].items()))
+            break
+        else:
+            neighbors.pop()
+            on_path.discard(path.pop())
+            lengths.pop()
+
+
+def iter_near_optimal_paths(grph, src, dst, max_length, weight='length'):
+    """
+    Enumerates the simple paths between two nodes which are shorter than a bound, in no particular order.
+    Unlike nx.shortest_simple_paths, no shortest path computation is needed per path
+    :param grph: Undirected graph with weight edge attributes
+    :param src: Source node
+    :param dst: Destination node
+    :param max_length: Length bound; the paths are strictly shorter
+    :param weight: Edge attribute of the lengths
+    :return: Generator of (path, path length)
+    """
+    for path, length in _iter_bounded_paths(grph, src, dst, max_length, weight):
+        yield list(path), length
+
+
+def find_near_optimal_paths_summary(grph, src, dst, max_length, weight='length'):
+    """
+    Counts the simple paths between two nodes which are shorter than a bound and collects the edges on
+    them without keeping the paths
+    :param grph: Undirected graph with weight edge attributes
+    :param src: Source node
+    :param dst: Destination node
+    :param max_length: Length bound; the paths are strictly shorter
+    :param weight: Edge attribute of the lengths
+    :return: Number of paths, dictionary of (node ID, node ID) -> 1 for the edges in path direction
+    """
+    count = 0
+    sel_edges = {}
+    for path, length in _iter_bounded_paths(grph, src, dst, max_length, weight):
+        count += 1
+        for i in range(len(path) - 1):
+            sel_edges[path[i], path[i + 1]] = 1
+    return count, sel_edges
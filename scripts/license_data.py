@@ -0,0 +1,319 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Loads the scraped license data (license_status_dates.txt and network.txt) of the entities into compact
+records with parsed dates, elevations and frequencies. Each file is parsed once per process.
+Run as a script to rewrite the frequencies of existing network.txt files under OUTPUT_DIR in MHz
+"""
+
+import math
+import os
+import numpy as np
+
+try:
+    from . import util
+except (ImportError, SystemError):
+    import util
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Entities which operate in the Chicago-NJ corridor
+ENTITY_NAMES = [
+    "AlarmNet, Inc",
+    "Transmission Holdings, Inc.",
+    "BNSF Railway Co.",
+    "COMMONWEALTH EDISON COMPANY",
+    "MPX, Inc",
+    "Illinois Central Railroad Company",
+    "Eastern MLG LLC",
+    "Jefferson Microwave, LLC",
+    "New Line Networks",
+    "Webline Holdings LLC",
+    "GTT Americas LLC",
+    "EG Broadcast Newco Corp",
+    "National Tower Company LLC",
+    "Wireless Internetwork, LLC",
+    "DC2A LLC",
+    "Geodesic Networks LLC",
+    "Blueline Comm",
+    "Argos Engineering, LLC",
+    "xWave Engineering LLC",
+    "North Central Tower Co, LLC",
+    "NeXXCom Wireless LLC",
+    "Fundamental Broadcasting LLC",
+    "AQ2AT LLC",
+    "World Class Wireless, LLC",
+    "Pierce Broadband, LLC",
+    "Spectrum Holding Company LLC",
+    "SW Networks",
+    "iSignal",
+    "Newgig networks"
+]
+
+# Parsed files: (absolute path, modification time) -> records
+_cache = {}
+
+
+def get_corr_name(entity):
+    """
+    Gets the directory name of an entity
+    :param entity: Entity name
+    :return: Entity name with spaces and punctuation replaced by underscores
+    """
+    return entity.replace(" ", "_").replace("/", "_").replace(".", "_").replace(",", "_").replace("&", "_")
+
+
+def parse_elevation(text):
+    """
+    Parses a tower elevation
+    :param text: Elevation string, e.g. 222.8m
+    :return: Elevation in meters
+    """
+    return float(text.strip().rstrip("m"))
+
+
+def parse_frequency(text):
+    """
+    Parses a link frequency; the center frequency is used for frequency ranges
+    :param text: Frequency string, e.g. 006123.10000000 or 010755.00000000-010835.00000000, optionally quoted
+    :return: Frequency in MHz
+    """
+    bounds = text.strip().strip("'").split("-")
+    return (float(bounds[0]) + float(bounds[-1])) / 2
+
+
+def parse_frequencies(items):
+    """
+    Parses a list of link frequencies, skipping empty items and items which are not frequencies
+    :param items: Frequency strings
+    :return: List of frequencies in MHz
+    """
+    frequencies = []
+    for item in items:
+        try:
+            frequencies.append(parse_frequency(item))
+        except ValueError:
+            pass
+    return frequencies
+
+
+def format_network_line(line):
+    """
+    Rewrites the frequency list of a network.txt line in MHz, e.g. ['006123.10000000'] as [6123.1]
+    :param line: Line in old or current format
+    :return: Line in current format, without the line break
+    """
+    parts = line.rstrip('\n').split(";")
+    parts[8] = str(parse_frequencies(parts[8].replace("[", "").replace("]", "").split(",")))
+    return ";".join(parts)
+
+
+class LicenseStatus:
+    """
+    Status and dates of a license; dates are None if not set
+    """
+    __slots__ = ("license_id", "status", "grant_date", "effective_date", "cancel_date", "expiry_date")
+
+    def __init__(self, license_id, status, grant_date, effective_date, cancel_date, expiry_date):
+        self.license_id = license_id
+        self.status = status
+        self.grant_date = grant_date
+        self.effective_date = effective_date
+        self.cancel_date = cancel_date
+        self.expiry_date = expiry_date
+
+    def end_date(self):
+        """
+        Gets the date on which the license stops being valid
+        :return: The earlier of the cancel and the expiry date
+        """
+        if self.cancel_date is not None and self.cancel_date < self.expiry_date:
+            return self.cancel_date
+        return self.expiry_date
+
+
+class Tower:
+    """
+    Tower location and elevation. Supports tower['lat_deg'] style access, so it can be used
+    wherever tower dictionaries are (e.g. util.compute_length_ground)
+    """
+    __slots__ = ("lat_deg", "lat_rad", "long_deg", "long_rad", "elevation")
+
+    def __init__(self, lat_deg, long_deg, elevation):
+        self.lat_deg = lat_deg
+        self.lat_rad = math.radians(lat_deg)
+        self.long_deg = long_deg
+        self.long_rad = math.radians(long_deg)
+        self.elevation = elevation
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+
+class Network:
+    """
+    Paths of the licenses of an entity. Towers are shared by all paths using them with the same elevation;
+    the transmitter and receiver tower IDs of the paths and their frequencies (MHz) are kept in arrays,
+    with the frequencies of path k in frequency[frequency_offsets[k]:frequency_offsets[k + 1]].
+    The Earth-centered coordinates of the towers and the path lengths are computed once for all paths
+    """
+    __slots__ = ("towers", "license_paths", "status", "transmitter", "receiver", "frequency_offsets", "frequency",
+                 "tower_xyz", "length")
+
+    def __init__(self, towers, license_paths, status, transmitter, receiver, frequency_offsets, frequency):
+        self.towers = towers
+        self.license_paths = license_paths
+        self.status = status
+        self.transmitter = transmitter
+        self.receiver = receiver
+        self.frequency_offsets = frequency_offsets
+        self.frequency = frequency
+        self.tower_xyz = util.compute_ecef([tower.lat_rad for tower in towers], [tower.long_rad for tower in towers])
+        self.length = util.compute_lengths_ground(self.tower_xyz[transmitter], self.tower_xyz[receiver])
+
+    def get_paths(self, license_id):
+        """
+        Gets the paths of a license
+        :param license_id: License ID
+        :return: List of (transmitter tower, receiver tower, frequency array, length (km)), in file order
+        """
+        paths = []
+        for k in self.license_paths.get(license_id.strip(), []):
+            paths.append((self.towers[self.transmitter[k]], self.towers[self.receiver[k]],
+                          self.frequency[self.frequency_offsets[k]:self.frequency_offsets[k + 1]],
+                          float(self.length[k])))
+        return paths
+
+
+def _get_cached(path, parse):
+    """
+    Parses a file, or gets its records from the cache if it has not been modified since it was parsed
+    :param path: File path
+    :param parse: Parser function taking the file path
+    :return: Parsed records
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _cache:
+        _cache[key] = parse(path)
+    return _cache[key]
+
+
+def _parse_license_statuses(path):
+    """
+    Parses a license_status_dates.txt file; dates which are empty or not in mm/dd/yyyy format are None
+    :param path: File path
+    :return: List of LicenseStatus, in file order
+    """
+    statuses = []
+    for line in open(path):
+        parts = line.rstrip('\n').split(",")
+        #3322637,Terminated,10/05/2011,08/30/2013,09/14/2014,10/05/2021
+        dates = []
+        for text in parts[2:6]:
+            try:
+                dates.append(util.parse_date(text))
+            except ValueError:
+                dates.append(None)
+        statuses.append(LicenseStatus(parts[0], parts[1], *dates))
+    return statuses
+
+
+def _parse_network(path):
+    """
+    Parses a network.txt file, interning towers by coordinates and elevation
+    :param path: File path
+    :return: Network
+    """
+    towers = []
+    tower_ids = {}
+    license_paths = {}
+    status = []
+    transmitter = []
+    receiver = []
+    frequency_offsets = [0]
+    frequency = []
+    for line in open(path):
+        parts = line.rstrip('\n').split(";")
+        #3369929;Active;41.79925;-88.23644;222.8m;41.88081;-87.64383;181.7m;[6123.1]
+        license_paths.setdefault(parts[0].strip(), []).append(len(status))
+        status.append(parts[1])
+        for column, ids in ((2, transmitter), (5, receiver)):
+            key = (float(parts[column]), float(parts[column + 1]), parse_elevation(parts[column + 2]))
+            if key not in tower_ids:
+                tower_ids[key] = len(towers)
+                towers.append(Tower(*key))
+            ids.append(tower_ids[key])
+        frequency.extend(parse_frequencies(parts[8].replace("[", "").replace("]", "").split(",")))
+        frequency_offsets.append(len(frequency))
+    return Network(towers, license_paths, status,
+                   np.array(transmitter, dtype=np.int32),
+                   np.array(receiver, dtype=np.int32),
+                   np.array(frequency_offsets, dtype=np.int64),
+                   np.array(frequency, dtype=np.float64))
+
+
+def clear_cache():
+    """
+    Forgets all parsed files, so that the next loads parse them again
+    :return: None
+    """
+    _cache.clear()
+
+
+def load_license_statuses(path):
+    """
+    Loads a license_status_dates.txt file; parsed files are cached until they are modified
+    :param path: File path
+    :return: List of LicenseStatus, in file order
+    """
+    return _get_cached(path, _parse_license_statuses)
+
+
+def load_network(path):
+    """
+    Loads a network.txt file; parsed files are cached until they are modified
+    :param path: File path
+    :return: Network
+    """
+    return _get_cached(path, _parse_network)
+
+
+def migrate_network_files():
+    """
+    Rewrites the frequencies of all network.txt files under OUTPUT_DIR in MHz
+    :return: None
+    """
+    for dirpath, dirnames, filenames in sorted(os.walk(OUTPUT_DIR)):
+        if "network.txt" not in filenames:
+            continue
+        path = os.path.join(dirpath, "network.txt")
+        lines = [format_network_line(line) for line in open(path)]
+        with open(path, 'w') as writer:
+            for line in lines:
+                writer.write(line + "\n")
+        print(path, len(lines))
+
+
+if __name__ == "__main__":
+    migrate_network_files()
@@ -0,0 +1,325 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Writes networks into the visualization HTML as one compact JSON payload, drawn by renderNetwork() of
+static_html/top.html, instead of one JavaScript call per tower and link. Coordinates are delta-encoded
+integers (COORD_SCALE units per degree) and links are written as polylines of tower indices. Chains of
+links which are nearly collinear can be merged into one polyline, and the polylines can be simplified
+(Douglas-Peucker), hiding the towers removed from them, until the map fits in MAX_MAP_POINTS points
+or the polylines cannot be simplified further. History maps hold the links of several entities once each,
+with the date intervals during which they are licensed, and are drawn by renderHistory() with a date slider
+"""
+
+from datetime import date
+import json
+import math
+
+try:
+    from . import util
+except (ImportError, SystemError):
+    import util
+
+# Coordinate units per degree; 1e5 keeps about 1 m
+COORD_SCALE = 100000
+
+# Links meeting at a tower without other links are merged into one polyline if the direction
+# changes by at most this angle (degrees) at the tower
+MERGE_ANGLE = 10.0
+
+# Initial Douglas-Peucker tolerance (km) of the simplification; 0 keeps all points
+SIMPLIFY_TOLERANCE = 0.0
+
+# Maximum number of polyline points (and tower markers) of a map; the simplification tolerance is
+# doubled (starting at MIN_SIMPLIFY_TOLERANCE) until the map fits. None does not bound the map
+MAX_MAP_POINTS = 20000
+MIN_SIMPLIFY_TOLERANCE = 0.1  # km
+
+# Numbers per write() call when streaming the payload
+WRITE_CHUNK = 4096
+
+# Dates of history maps are written as days since EPOCH
+EPOCH = date(1970, 1, 1)
+
+
+def _project(grph, node_ids):
+    """
+    Projects towers on a plane tangent to the Earth at their mean latitude (equirectangular projection)
+    :param grph: Graph with 'lat_deg' and 'long_deg' node attributes
+    :param node_ids: Node IDs
+    :return: List of (x, y) in km
+    """
+    lats = [math.radians(float(grph.nodes[u]['lat_deg'])) for u in node_ids]
+    longs = [math.radians(float(grph.nodes[u]['long_deg'])) for u in node_ids]
+    cos_lat = math.cos(sum(lats) / len(lats)) if lats else 1.0
+    return [(util.EARTH_RADIUS * long_rad * cos_lat, util.EARTH_RADIUS * lat_rad)
+            for lat_rad, long_rad in zip(lats, longs)]
+
+
+def _turn_angle(a, b, c):
+    """
+    Gets the change of direction at b of the path a-b-c
+    :param a: Point (x, y)
+    :param b: Point (x, y)
+    :param c: Point (x, y)
+    :return: Angle in degrees
+    """
+    angle = math.atan2(c[1] - b[1], c[0] - b[0]) - math.atan2(b[1] - a[1], b[0] - a[0])
+    return abs(math.degrees((angle + math.pi) % (2 * math.pi) - math.pi))
+
+
+def get_polylines(grph, merge_collinear=True, merge_angle=MERGE_ANGLE):
+    """
+    Gets the links of a graph as polylines, ignoring their direction
+    :param grph: Graph with 'lat_deg' and 'long_deg' node attributes
+    :param merge_collinear: Whether to merge chains of nearly collinear links into one polyline
+    :param merge_angle: Maximum change of direction (degrees) at the towers inside a merged polyline
+    :return: List of polylines, each a list of node IDs
+    """
+    neighbors = {u: [] for u in grph.nodes}
+    for u, v in grph.edges:
+        if u != v and v not in neighbors[u]:
+            neighbors[u].append(v)
+            neighbors[v].append(u)
+    joints = set()
+    if merge_collinear:
+        node_ids = list(neighbors)
+        position = dict(zip(node_ids, _project(grph, node_ids)))
+        for u in node_ids:
+            if len(neighbors[u]) == 2:
+                a, c = neighbors[u]
+                if _turn_angle(position[a], position[u], position[c]) <= merge_angle:
+                    joints.add(u)
+    polylines = []
+    visited = set()
+    for u in neighbors:
+        for v in neighbors[u]:
+            if (u, v) in visited or u in joints:
+                continue
+            polyline = [u, v]
+            visited.add((u, v))
+            visited.add((v, u))
+            # Follows the chain through the joints until a tower which is not a joint
+            while polyline[-1] in joints and polyline[-1] != u:
+                a, c = neighbors[polyline[-1]]
+                nxt = c if a == polyline[-2] else a
+                visited.add((polyline[-1], nxt))
+                visited.add((nxt, polyline[-1]))
+                polyline.append(nxt)
+            polylines.append(polyline)
+    # Cycles made only of joints
+    for u in neighbors:
+        if u not in joints or (u, neighbors[u][0]) in visited:
+            continue
+        polyline = [u, neighbors[u][0]]
+        visited.add((u, polyline[1]))
+        visited.add((polyline[1], u))
+        while polyline[-1] != u:
+            a, c = neighbors[polyline[-1]]
+            nxt = c if a == polyline[-2] else a
+            visited.add((polyline[-1], nxt))
+            visited.add((nxt, polyline[-1]))
+            polyline.append(nxt)
+        polylines.append(polyline)
+    return polylines
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Simplifies a polyline with the Douglas-Peucker algorithm; the end points are always kept
+    :param points: List of (x, y) in km
+    :param tolerance: Maximum distance (km) of a removed point from the simplified polyline
+    :return: Sorted list of the indices of the kept points
+    """
+    keep = [0, len(points) - 1]
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        norm = math.hypot(x2 - x1, y2 - y1)
+        max_dist = -1
+        max_index = None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if norm > 0:
+                dist = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / norm
+            else:
+                dist = math.hypot(x - x1, y - y1)
+            if dist > max_dist:
+                max_dist = dist
+                max_index = i
+        if max_index is not None and max_dist > tolerance:
+            keep.append(max_index)
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+    return sorted(set(keep))
+
+
+def get_map_data(grph, merge_collinear=True, simplify_tolerance=SIMPLIFY_TOLERANCE, max_points=MAX_MAP_POINTS):
+    """
+    Gets the towers and polylines to draw
+    :param grph: Graph with 'lat_deg' and 'long_deg' node attributes
+    :param merge_collinear: Whether to merge chains of nearly collinear links into one polyline
+    :param simplify_tolerance: Douglas-Peucker tolerance (km) of the polylines
+    :param max_points: Maximum number of polyline points and tower markers, or None
+    :return: List of node IDs to draw as towers, list of polylines (lists of node IDs)
+    """
+    polylines = get_polylines(grph, merge_collinear)
+    positions = [_project(grph, polyline) for polyline in polylines]
+    tolerance = simplify_tolerance
+    while True:
+        simplified = []
+        for polyline, points in zip(polylines, positions):
+            if tolerance > 0:
+                simplified.append([polyline[i] for i in simplify_polyline(points, tolerance)])
+            else:
+                simplified.append(polyline)
+        # Towers left out of all simplified polylines are hidden as well
+        removed = set(u for polyline in polylines for u in polyline[1:-1])
+        removed -= set(u for polyline in simplified for u in polyline)
+        towers = [u for u in grph.nodes if u not in removed]
+        num_points = len(towers) + sum(len(polyline) for polyline in simplified)
+        if max_points is None or num_points <= max_points or not merge_collinear:
+            return towers, simplified
+        if tolerance > 0 and all(len(polyline) == 2 for polyline in simplified):
+            return towers, simplified
+        tolerance = max(2 * tolerance, MIN_SIMPLIFY_TOLERANCE)
+
+
+def _write_numbers(writer, values):
+    """
+    Writes a JSON array of numbers in chunks of WRITE_CHUNK numbers
+    :param writer: Writer
+    :param values: List of numbers
+    :return: None
+    """
+    writer.write("[")
+    for i in range(0, len(values), WRITE_CHUNK):
+        if i > 0:
+            writer.write(",")
+        writer.write(",".join(map(str, values[i:i + WRITE_CHUNK])))
+    writer.write("]")
+
+
+def write_map_data(writer, grph, style, data_centers=(), merge_collinear=True,
+                   simplify_tolerance=SIMPLIFY_TOLERANCE, max_points=MAX_MAP_POINTS):
+    """
+    Writes the renderNetwork() call drawing a network
+    :param writer: Writer for the HTML file, between static_html/top.html and static_html/bottom.html
+    :param grph: Graph with 'lat_deg' and 'long_deg' node attributes
+    :param style: Dictionary of nodeColor, nodeSize, edgeColor and edgeWeight
+    :param data_centers: Data centers (dictionaries with 'lat_deg' and 'long_deg') drawn as large orange markers
+    :param merge_collinear: Whether to merge chains of nearly collinear links into one polyline
+    :param simplify_tolerance: Douglas-Peucker tolerance (km) of the polylines
+    :param max_points: Maximum number of polyline points and tower markers, or None
+    :return: None
+    """
+    towers, polylines = get_map_data(grph, merge_collinear, simplify_tolerance, max_points)
+    # Coordinates of all towers used by markers or polylines, delta-encoded
+    index = {}
+    coords = []
+    last_lat = 0
+    last_long = 0
+    for u in towers + [u for polyline in polylines for u in polyline]:
+        if u in index:
+            continue
+        index[u] = len(index)
+        lat = int(round(float(grph.nodes[u]['lat_deg']) * COORD_SCALE))
+        lng = int(round(float(grph.nodes[u]['long_deg']) * COORD_SCALE))
+        coords.append(lat - last_lat)
+        coords.append(lng - last_long)
+        last_lat = lat
+        last_long = lng
+    # Each polyline is its point count followed by its tower indices
+    lines = []
+    for polyline in polylines:
+        lines.append(len(polyline))
+        lines.extend(index[u] for u in polyline)
+    writer.write("renderNetwork({\"scale\":" + str(COORD_SCALE) + ",\"style\":" + json.dumps(style)
+                 + ",\"dataCenters\":" + json.dumps([[dc['lat_deg'], dc['long_deg']] for dc in data_centers])
+                 + ",\"towers\":" + str(len(towers)) + ",\"coords\":")
+    _write_numbers(writer, coords)
+    writer.write(",\"lines\":")
+    _write_numbers(writer, lines)
+    writer.write("});\n")
+
+
+def merge_intervals(intervals):
+    """
+    Merges overlapping or touching date intervals
+    :param intervals: List of (start, end) dates; an interval contains start and not end
+    :return: Sorted list of disjoint (start, end)
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def write_history_map_data(writer, entity_links, first_date, last_date, style, data_centers=()):
+    """
+    Writes the renderHistory() call drawing the networks of several entities over time, with a slider
+    from first_date to last_date showing the links licensed on the selected date
+    :param writer: Writer for the HTML file, between static_html/top.html and static_html/bottom.html
+    :param entity_links: List of (entity name, dictionary of link ((lat, long), (lat, long)) in degrees
+    -> list of (start date, end date) during which the link is licensed)
+    :param first_date: First date of the slider
+    :param last_date: Last date of the slider
+    :param style: Dictionary of nodeSize and edgeWeight; links get the colors of their entities
+    :param data_centers: Data centers (dictionaries with 'lat_deg' and 'long_deg') drawn as large orange markers
+    :return: None
+    """
+    index = {}
+    coords = []
+    last_lat = 0
+    last_long = 0
+    # Each link is its tower indices, its entity index, its number of intervals and their start and end days
+    links = []
+    for entity_id, (corr_name, link_intervals) in enumerate(entity_links):
+        for link in link_intervals:
+            for lat_deg, long_deg in link:
+                point = (int(round(lat_deg * COORD_SCALE)), int(round(long_deg * COORD_SCALE)))
+                if point not in index:
+                    index[point] = len(index)
+                    coords.append(point[0] - last_lat)
+                    coords.append(point[1] - last_long)
+                    last_lat, last_long = point
+                links.append(index[point])
+            intervals = merge_intervals(link_intervals[link])
+            links.append(entity_id)
+            links.append(len(intervals))
+            for start, end in intervals:
+                links.append((start - EPOCH).days)
+                links.append((end - EPOCH).days)
+    writer.write("renderHistory({\"scale\":" + str(COORD_SCALE) + ",\"style\":" + json.dumps(style)
+                 + ",\"dataCenters\":" + json.dumps([[dc['lat_deg'], dc['long_deg']] for dc in data_centers])
+                 + ",\"entities\":" + json.dumps([corr_name for corr_name, link_intervals in entity_links])
+                 + ",\"firstDay\":" + str((first_date - EPOCH).days)
+                 + ",\"lastDay\":" + str((last_date - EPOCH).days) + ",\"coords\":")
+    _write_numbers(writer, coords)
+    writer.write(",\"links\":")
+    _write_numbers(writer, links)
+    writer.write("});\n")
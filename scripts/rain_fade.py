@@ -0,0 +1,300 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Estimates which links of a network fail in rain and the resulting latency between two data centers.
+The rain attenuation of every frequency of every link is computed at once for all weather scenarios:
+specific attenuation k * R^alpha (ITU-R P.838-3, horizontal polarization) times the link length
+and the ITU-R P.530 distance factor, with the rain rate R averaged over the towers and the midpoint of
+the link. A link fails when all its frequencies fade by more than FADE_MARGIN. Latencies with the
+failed links removed are evaluated with what_if, once per distinct set of failed links
+"""
+
+import os
+import time
+import numpy as np
+
+try:
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
+    from . import what_if
+except (ImportError, SystemError):
+    import graph_snapshot
+    import latency
+    import license_data
+    import what_if
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Entity and date of the network evaluated when run as a script; Format: mm_dd_yyyy
+ENTITY = "New Line Networks"
+SNAPSHOT_DATE = "04_01_2020"
+
+# Data centers (names in latency.DATA_CENTERS) between which latencies are evaluated
+SRC_DC = "cme"
+DST_DC = "ny4"
+
+# Rain rate file: lines of scenario,lat_deg,long_deg,rain rate (mm/h) on a regular grid of cell
+# centers (e.g. hourly radar rain rates). Without the file, UNIFORM_RAIN_RATES over the whole corridor are used
+RAIN_FILE = "../weather/rain_rates.csv"
+UNIFORM_RAIN_RATES = [0, 5, 10, 25, 50, 75, 100, 150]
+
+# Fade margin (dB) of the links; a frequency whose rain attenuation exceeds it is out
+FADE_MARGIN = 35.0
+
+# Rain attenuation coefficients (ITU-R P.838-3, horizontal polarization): frequency (GHz), k, alpha.
+# k is interpolated log-log and alpha log-linear in frequency
+RAIN_COEFFICIENTS = np.array([
+    [1, 0.0000259, 0.9691],
+    [2, 0.0000847, 1.0664],
+    [4, 0.0001071, 1.6009],
+    [6, 0.0007056, 1.5900],
+    [7, 0.001915, 1.4810],
+    [8, 0.004115, 1.3905],
+    [10, 0.01217, 1.2571],
+    [12, 0.02386, 1.1825],
+    [15, 0.04481, 1.1233],
+    [20, 0.09164, 1.0568],
+    [25, 0.1571, 0.9991],
+    [30, 0.2403, 0.9485],
+    [35, 0.3374, 0.9047],
+    [40, 0.4431, 0.8673]
+])
+
+# The ITU-R P.530 distance factor is capped at this value
+MAX_DISTANCE_FACTOR = 2.5
+
+
+class RainGrid:
+    """
+    Rain rates of weather scenarios on a regular grid of cells; a grid of one cell covers everything
+    """
+    __slots__ = ("names", "lats", "longs", "rates")
+
+    def __init__(self, names, lats, longs, rates):
+        """
+        :param names: Scenario names
+        :param lats: Sorted latitudes (degrees) of the cell centers
+        :param longs: Sorted longitudes (degrees) of the cell centers
+        :param rates: Array of shape (scenarios, latitudes, longitudes) of rain rates (mm/h)
+        """
+        self.names = names
+        self.lats = lats
+        self.longs = longs
+        self.rates = rates
+
+    def get_rates(self, lat_deg, long_deg):
+        """
+        Gets the rain rates at points from the nearest cells; points outside the grid get no rain
+        :param lat_deg: Array of latitudes in degrees
+        :param long_deg: Array of longitudes in degrees
+        :return: Array of shape (scenarios, points) of rain rates (mm/h)
+        """
+        indices = []
+        inside = np.ones(len(lat_deg), dtype=bool)
+        for centers, values in ((self.lats, lat_deg), (self.longs, long_deg)):
+            if len(centers) > 1:
+                index = np.rint((values - centers[0]) / (centers[1] - centers[0])).astype(np.int64)
+                inside &= (index >= 0) & (index < len(centers))
+                index = np.clip(index, 0, len(centers) - 1)
+            else:
+                index = np.zeros(len(values), dtype=np.int64)
+            indices.append(index)
+        rates = self.rates[:, indices[0], indices[1]]
+        rates[:, ~inside] = 0
+        return rates
+
+
+def load_rain_grid(path):
+    """
+    Loads a rain rate file; cells missing for a scenario get no rain
+    :param path: File with lines of scenario,lat_deg,long_deg,rain rate (mm/h)
+    :return: RainGrid
+    """
+    names = {}
+    rows = []
+    for line in open(path):
+        parts = line.strip().split(",")
+        if len(parts) < 4:
+            continue
+        try:
+            rows.append((names.setdefault(parts[0], len(names)), float(parts[1]), float(parts[2]), float(parts[3])))
+        except ValueError:
+            # Header
+            continue
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    lats, lat_index = np.unique(data[:, 1], return_inverse=True)
+    longs, long_index = np.unique(data[:, 2], return_inverse=True)
+    rates = np.zeros((len(names), len(lats), len(longs)))
+    rates[data[:, 0].astype(int), lat_index, long_index] = data[:, 3]
+    return RainGrid(list(names), lats, longs, rates)
+
+
+def get_uniform_rain_grid(rain_rates):
+    """
+    Gets scenarios of the same rain rate everywhere
+    :param rain_rates: List of rain rates (mm/h)
+    :return: RainGrid of one cell covering the Earth
+    """
+    return RainGrid([str(rate) for rate in rain_rates], np.array([0.0]), np.array([0.0]),
+                    np.array(rain_rates, dtype=np.float64).reshape(-1, 1, 1))
+
+
+def get_rain_coefficients(frequency_ghz):
+    """
+    Interpolates the rain attenuation coefficients
+    :param frequency_ghz: Array of frequencies (GHz)
+    :return: Arrays of k and alpha
+    """
+    log_f = np.log10(np.clip(frequency_ghz, RAIN_COEFFICIENTS[0, 0], RAIN_COEFFICIENTS[-1, 0]))
+    log_table = np.log10(RAIN_COEFFICIENTS[:, 0])
+    k = 10 ** np.interp(log_f, log_table, np.log10(RAIN_COEFFICIENTS[:, 1]))
+    alpha = np.interp(log_f, log_table, RAIN_COEFFICIENTS[:, 2])
+    return k, alpha
+
+
+def compute_attenuation(rain_rates, lengths, frequency_ghz):
+    """
+    Computes rain attenuations
+    :param rain_rates: Array of shape (scenarios, channels) of rain rates (mm/h) along the channels
+    :param lengths: Array of the link lengths (km) of the channels
+    :param frequency_ghz: Array of the frequencies (GHz) of the channels
+    :return: Array of shape (scenarios, channels) of attenuations (dB)
+    """
+    k, alpha = get_rain_coefficients(frequency_ghz)
+    rain_rates = np.maximum(rain_rates, 0)
+    gamma = k * rain_rates ** alpha
+    # Distance factor: rain cells do not cover long links uniformly
+    with np.errstate(divide='ignore'):
+        denominator = (0.477 * lengths ** 0.633 * rain_rates ** (0.073 * alpha) * frequency_ghz ** 0.123
+                       - 10.579 * (1 - np.exp(-0.024 * lengths)))
+        factor = np.where(denominator > 1 / MAX_DISTANCE_FACTOR, 1 / denominator, MAX_DISTANCE_FACTOR)
+    return gamma * lengths * factor
+
+
+def get_link_channels(grph):
+    """
+    Gets the links of a graph and their frequencies; links of both directions are the same link, with
+    the frequencies of both
+    :param grph: Graph with 'lat_deg'/'long_deg' node and 'length'/'frequency_list' (MHz) edge attributes
+    :return: List of links (node ID, node ID), array of lengths (km), array of the link of each channel,
+    array of the frequencies (GHz) of the channels, arrays of the latitudes and longitudes (degrees) of
+    the towers and midpoints of the links, of shape (links, 3)
+    """
+    index = {}
+    links = []
+    lengths = []
+    channel_links = []
+    frequencies = []
+    for u, v, data in grph.edges(data=True):
+        if u == v:
+            continue
+        if (v, u) not in index:
+            index[u, v] = len(links)
+            links.append((u, v))
+            lengths.append(data['length'])
+        for f in data['frequency_list']:
+            channel_links.append(index.get((u, v), index.get((v, u))))
+            frequencies.append(f / 1000)
+    lat = np.array([[float(grph.nodes[u]['lat_deg']), float(grph.nodes[v]['lat_deg'])] for u, v in links]).reshape(-1, 2)
+    lng = np.array([[float(grph.nodes[u]['long_deg']), float(grph.nodes[v]['long_deg'])] for u, v in links]).reshape(-1, 2)
+    lat = np.column_stack((lat, lat.mean(axis=1)))
+    lng = np.column_stack((lng, lng.mean(axis=1)))
+    return (links, np.array(lengths, dtype=np.float64), np.array(channel_links, dtype=np.int64),
+            np.array(frequencies, dtype=np.float64), lat, lng)
+
+
+def find_failed_links(grph, rain_grid, fade_margin=FADE_MARGIN):
+    """
+    Finds the links which fail in each scenario, i.e. links all of whose frequencies fade by more than
+    the margin. Links without frequencies never fail
+    :param grph: Graph with 'lat_deg'/'long_deg' node and 'length'/'frequency_list' (MHz) edge attributes
+    :param rain_grid: RainGrid
+    :param fade_margin: Fade margin (dB)
+    :return: List of links (node ID, node ID), boolean array of shape (scenarios, links) of failures
+    """
+    links, lengths, channel_links, frequency_ghz, lat, lng = get_link_channels(grph)
+    failed = np.zeros((len(rain_grid.names), len(links)), dtype=bool)
+    if len(frequency_ghz) == 0:
+        return links, failed
+    link_rates = rain_grid.get_rates(lat.ravel(), lng.ravel()).reshape(len(rain_grid.names), len(links), 3).mean(axis=2)
+    attenuation = compute_attenuation(link_rates[:, channel_links], lengths[channel_links], frequency_ghz)
+    # A link is up while one of its channels is; channels are grouped by link
+    order = np.argsort(channel_links, kind='stable')
+    starts = np.flatnonzero(np.diff(channel_links[order], prepend=-1))
+    up = np.logical_or.reduceat(attenuation[:, order] <= fade_margin, starts, axis=1)
+    failed[:, channel_links[order][starts]] = ~up
+    return links, failed
+
+
+def find_weather_latencies(grph, rain_grid, src_dc, dst_dc, fade_margin=FADE_MARGIN):
+    """
+    Gets the minimum stretch path between two data centers in each weather scenario
+    :param grph: Graph with 'lat_deg'/'long_deg' node and 'length'/'frequency_list' (MHz) edge attributes
+    :param rain_grid: RainGrid
+    :param src_dc: Source data center
+    :param dst_dc: Destination data center
+    :param fade_margin: Fade margin (dB)
+    :return: List of (number of failed links, result of what_if.LatencyWhatIf.evaluate()) per scenario
+    """
+    links, failed = find_failed_links(grph, rain_grid, fade_margin)
+    engine = what_if.LatencyWhatIf(grph, src_dc, dst_dc)
+    results = {}
+    latencies = []
+    for row in failed:
+        key = row.tobytes()
+        if key not in results:
+            results[key] = engine.evaluate(what_if.Scenario(removed_links=[links[i] for i in np.flatnonzero(row)]))
+        latencies.append((int(row.sum()), results[key]))
+    return latencies
+
+
+if __name__ == "__main__":
+    corr_name = license_data.get_corr_name(ENTITY)
+    G = graph_snapshot.read_graph(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE)
+    DC = latency.get_data_centers([SRC_DC, DST_DC])
+    if os.path.exists(RAIN_FILE):
+        rain_grid = load_rain_grid(RAIN_FILE)
+    else:
+        print("No rain file", RAIN_FILE, "; uniform rain rates", UNIFORM_RAIN_RATES)
+        rain_grid = get_uniform_rain_grid(UNIFORM_RAIN_RATES)
+    start = time.time()
+    latencies = find_weather_latencies(G, rain_grid, DC[0], DC[1])
+    print("Scenarios", len(latencies), "%.3f s" % (time.time() - start))
+    writer = open(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE + "/rain_latency_" + DST_DC + ".txt", 'w')
+    for name, (num_failed, result) in zip(rain_grid.names, latencies):
+        if result is None:
+            print(name, num_failed, "disconnected")
+            writer.write(name + "," + str(num_failed) + ",,,,\n")
+            continue
+        towers, path_length, dist_fiber, stretch_aggr, latency_us = result
+        print(name, num_failed, path_length, dist_fiber, stretch_aggr, latency_us)
+        writer.write(name
+                     + "," + str(num_failed)
+                     + "," + str(path_length)
+                     + "," + str(dist_fiber)
+                     + "," + str(stretch_aggr)
+                     + "," + str(latency_us)
+                     + "\n")
+    writer.close()
@@ -21,57 +21,62 @@
 # SOFTWARE.
 
 """
-Reconstructs networks on a specific date from licenses which were active on that date
+Reconstructs networks on specific dates from licenses which were active on those dates.
+License and network files are parsed once per entity for all dates in RECONSTRUST_DATES
 """
 
 from datetime import datetime
 import networkx as nx
-import math
 import os
 
 try:
-    from . import util
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
+    from . import map_export
 except (ImportError, SystemError):
-    import util
+    import graph_snapshot
+    import latency
+    import license_data
+    import map_export
 
-# Date when you want to reconstruct the network; Format: mm_dd_yyyy
-RECONSTRUST_DATE = "01_01_2020"
+# If True, one graph is evolved through RECONSTRUST_DATES by applying license grant and end events;
+# node IDs are then tower IDs shared by all dates. If False, each date's graph is rebuilt from scratch
+INCREMENTAL_GRAPHS = True
+
+# Whether to also write the human-readable (but slow to write and load) graph_active.yaml
+# next to the binary graph_active.bin snapshot
+WRITE_YAML = False
+
+# Whether to write a viz_active.html for every date, and whether to write the history visualization
+# (OUT_FILE_HISTORY_HTML) showing the links of all entities on any date of RECONSTRUST_DATES in one file
+WRITE_DATE_HTML = False
+WRITE_HISTORY_HTML = True
+
+# Dates when you want to reconstruct the network; Format: mm_dd_yyyy
+# A regular series can be generated, e.g. util.get_date_range("01_01_2011", "04_01_2020", months=1)
+RECONSTRUST_DATES = [
+    "01_01_2011",
+    "01_01_2012",
+    "01_01_2013",
+    "01_01_2014",
+    "01_01_2015",
+    "01_01_2016",
+    "01_01_2017",
+    "01_01_2018",
+    "01_01_2019",
+    "01_01_2020",
+    "04_01_2020"
+]
 
 # Output data directory
 OUTPUT_DIR = "../output_entity_wise/"
 
+# History visualization of all entities
+OUT_FILE_HISTORY_HTML = OUTPUT_DIR + "00_history/viz_history.html"
+
 # Entities which operate in the Chicago-NJ corridor
-ENTITY_NAMES = [
-    "AlarmNet, Inc",
-    "Transmission Holdings, Inc.",
-    "BNSF Railway Co.",
-    "COMMONWEALTH EDISON COMPANY",
-    "MPX, Inc",
-    "Illinois Central Railroad Company",
-    "Eastern MLG LLC",
-    "Jefferson Microwave, LLC",
-    "New Line Networks",
-    "Webline Holdings LLC",
-    "GTT Americas LLC",
-    "EG Broadcast Newco Corp",
-    "National Tower Company LLC",
-    "Wireless Internetwork, LLC",
-    "DC2A LLC",
-    "Geodesic Networks LLC",
-    "Blueline Comm",
-    "Argos Engineering, LLC",
-    "xWave Engineering LLC",
-    "North Central Tower Co, LLC",
-    "NeXXCom Wireless LLC",
-    "Fundamental Broadcasting LLC",
-    "AQ2AT LLC",
-    "World Class Wireless, LLC",
-    "Pierce Broadband, LLC",
-    "Spectrum Holding Company LLC",
-    "SW Networks",
-    "iSignal",
-    "Newgig networks"
-]
+ENTITY_NAMES = license_data.ENTITY_NAMES
 
 EARTH_RADIUS = 6371  # km
 
@@ -79,6 +84,12 @@ EARTH_RADIUS = 6371  # km
 topFile = "static_html/top.html"
 bottomFile = "static_html/bottom.html"
 
+# Tower and link style of the visualization, and whether chains of nearly collinear links are drawn
+# as one polyline (see map_export)
+MAP_STYLE = {"nodeColor": "black", "nodeSize": 2, "edgeColor": "red", "edgeWeight": 1.4}
+HISTORY_MAP_STYLE = {"nodeSize": 2, "edgeWeight": 1.4}
+MERGE_COLLINEAR_LINKS = True
+
 G = nx.DiGraph()
 valid_licenses = []
 nodes = {}
@@ -87,48 +98,55 @@ global_node_counter = 0
 edges = {}
 
 
-def find_valid_license():
+def load_license_intervals():
     """
-    Find licenses which are active
-    :return: None; active license appended to valid_licenses
+    Gets the validity interval of each license from the (once parsed) license file.
+    A license is valid on date d if grant date <= d < end, where end is the earlier of cancel and expiry date
+    :return: List of (license ID, grant date, end date) of licenses which are valid on some date, in file order
     """
-    rec_date = datetime.strptime(RECONSTRUST_DATE, '%m_%d_%Y').date()
-    print("Reconstruction date", rec_date)
-    lines = [line.rstrip('\n') for line in open(license_file)]
-    for i in range(len(lines)):
-        parts = lines[i].split(",")
-        #3322637,Terminated,10/05/2011,08/30/2013,09/14/2014,10/05/2021
-        license_id = parts[0]
-        license_status = parts[1]
-        grant_date = datetime.strptime(parts[2], '%m/%d/%Y').date()
-        #effective_date = datetime.strptime(parts[3], '%m/%d/%Y').date()
-        try:
-            cancel_date = datetime.strptime(parts[4], '%m/%d/%Y').date()
-        except:
-            cancel_date = None
-        expiry_date = datetime.strptime(parts[5], '%m/%d/%Y').date()
-        isLicenseValid = False
-        if grant_date <= rec_date and expiry_date > rec_date:
-            if cancel_date != None:
-                if cancel_date > rec_date:
-                    isLicenseValid = True
-            else:
-                isLicenseValid = True
-        #print(license_id, license_status, isLicenseValid, grant_date, cancel_date, expiry_date)
-        if isLicenseValid:
-            valid_licenses.append(license_id)
-
-
-def add_to_graph(transmitter, receiver, frequencies):
+    intervals = []
+    for license in license_data.load_license_statuses(license_file):
+        end_date = license.end_date()
+        if license.grant_date < end_date:
+            intervals.append((license.license_id, license.grant_date, end_date))
+    return intervals
+
+
+def find_valid_licenses(dates):
+    """
+    Find licenses which are active on each date, sweeping once over the grant and end dates of all licenses
+    :param dates: List of dates in format mm_dd_yyyy
+    :return: Dictionary of date -> list of active license IDs, in license file order
+    """
+    intervals = load_license_intervals()
+    starts = sorted(range(len(intervals)), key=lambda i: intervals[i][1])
+    ends = sorted(range(len(intervals)), key=lambda i: intervals[i][2])
+    next_start = 0
+    next_end = 0
+    active = set()
+    valid_licenses_by_date = {}
+    for date in sorted(set(dates), key=lambda d: datetime.strptime(d, '%m_%d_%Y')):
+        rec_date = datetime.strptime(date, '%m_%d_%Y').date()
+        while next_start < len(starts) and intervals[starts[next_start]][1] <= rec_date:
+            active.add(starts[next_start])
+            next_start += 1
+        while next_end < len(ends) and intervals[ends[next_end]][2] <= rec_date:
+            active.discard(ends[next_end])
+            next_end += 1
+        valid_licenses_by_date[date] = [intervals[i][0] for i in sorted(active)]
+    return valid_licenses_by_date
+
+
+def add_to_graph(transmitter, receiver, frequencies, geo_dist):
     """
     Adds tower-tower MW hops to the graph
     :param transmitter: Transmitting tower
     :param receiver: Receiving tower
     :param frequencies: Link operating frequencies
+    :param geo_dist: Distance between the towers (km)
     :return: None; graph G is updated
     """
     global G, nodes, nodes_by_id, global_node_counter, edges
-    geo_dist = util.compute_length_ground(transmitter, receiver)
     #print(transmitter, receiver)
     transmitter_id = -1
     receiver_id = -1
@@ -169,66 +187,140 @@ def reconstruct_network():
     Reconstructs network on the specific date using licenses active on that date
     :return: None
     """
-    lines = [line.rstrip('\n') for line in open(network_file)]
+    network = license_data.load_network(network_file)
     for lic_id in valid_licenses:
-        for i in range(len(lines)):
-            parts = lines[i].split(";")
-            if parts[0].strip() == lic_id.strip():
-                transmitter = {
-                    "lat_deg": float(parts[2]),
-                    "lat_rad": math.radians(float(parts[2])),
-                    "long_deg": float(parts[3]),
-                    "long_rad": math.radians(float(parts[3])),
-                    "elevation": parts[4]
-                }
-                receiver = {
-                    "lat_deg": float(parts[5]),
-                    "lat_rad": math.radians(float(parts[5])),
-                    "long_deg": float(parts[6]),
-                    "long_rad": math.radians(float(parts[6])),
-                    "elevation": parts[7]
-                }
-                frequencies_text = parts[8].replace("[","").replace("]","").replace(" ","").split(",")
-                frequencies = []
-                for freq in frequencies_text:
-                    frequencies.append(freq)
-                #print(transmitter, receiver, frequencies)
-                add_to_graph(transmitter, receiver, frequencies)
+        for transmitter, receiver, frequencies, length in network.get_paths(lic_id):
+            #print(transmitter, receiver, frequencies)
+            # The graph gets its own frequency list, as add_to_graph extends it for parallel licenses
+            add_to_graph(transmitter, receiver, frequencies.tolist(), length)
 
 
-def visualize_graph(writer):
+def iter_graphs(dates):
     """
-    Generates HTML file for visualizing the MW network
-    :param writer: Writer for the HTML file
-    :return: None; the HTML file is generated
+    Evolves a single graph through the given dates by sweeping over license grant and end events:
+    the paths of a license are added when it is granted and removed when it is cancelled or expires.
+    Validity follows find_valid_licenses(), and each graph has the towers, elevations, links, lengths and
+    frequency lists (ordered as in the license file) that reconstruct_network() builds for the same date.
+    Node IDs are tower IDs in order of first appearance in the network file, so they are stable across dates
+    :param dates: List of dates in format mm_dd_yyyy
+    :return: Generator of (date, graph) in chronological order; the same graph is updated in place
+    after each step, so copy it to keep a snapshot
     """
+    intervals = load_license_intervals()
+    network = license_data.load_network(network_file)
+    tower_ids = {}
+    for tower in network.towers:
+        if (tower.lat_deg, tower.long_deg) not in tower_ids:
+            tower_ids[tower.lat_deg, tower.long_deg] = len(tower_ids)
+
+    grph = nx.DiGraph()
+    # Tower ID -> {(license position, path position, 0 for transmitter/1 for receiver): elevation};
+    # as in add_to_graph, the elevation comes from the first path using the tower
+    tower_refs = [{} for tower_id in tower_ids]
+    # (transmitter ID, receiver ID) -> {(license position, path position): frequencies}
+    link_freqs = {}
 
-    # CME - CyrusOne
-    writer.write("createNode( 41.7965645 , -88.243012 , 'orange', 8);\n")
+    def update_link(link):
+        if link_freqs[link]:
+            grph[link[0]][link[1]]['frequency_list'] = [f for key in sorted(link_freqs[link])
+                                                         for f in link_freqs[link][key]]
+        else:
+            del link_freqs[link]
+            grph.remove_edge(link[0], link[1])
 
-    # CBOE (NY4)
-    writer.write("createNode( 40.7772608 , -74.071748 , 'orange', 8);\n")
+    def add_license(i):
+        for j, (transmitter, receiver, frequencies, length) in enumerate(network.get_paths(intervals[i][0])):
+            link = (tower_ids[transmitter.lat_deg, transmitter.long_deg],
+                    tower_ids[receiver.lat_deg, receiver.long_deg])
+            for role, tower in enumerate((transmitter, receiver)):
+                tower_id = link[role]
+                if not tower_refs[tower_id]:
+                    grph.add_node(tower_id,
+                                  lat_deg=tower.lat_deg,
+                                  long_deg=tower.long_deg,
+                                  elevation=tower.elevation)
+                tower_refs[tower_id][i, j, role] = tower.elevation
+                grph.nodes[tower_id]['elevation'] = tower_refs[tower_id][min(tower_refs[tower_id])]
+            if link not in link_freqs:
+                link_freqs[link] = {}
+                grph.add_edge(link[0], link[1], frequency_list=[], length=length)
+            link_freqs[link][i, j] = frequencies.tolist()
+            update_link(link)
 
-    # NYSE
-    writer.write("createNode( 41.0783577 , -74.1529141 , 'orange', 8);\n")
+    def remove_license(i):
+        for j, (transmitter, receiver, frequencies, length) in enumerate(network.get_paths(intervals[i][0])):
+            link = (tower_ids[transmitter.lat_deg, transmitter.long_deg],
+                    tower_ids[receiver.lat_deg, receiver.long_deg])
+            del link_freqs[link][i, j]
+            update_link(link)
+            for role in range(2):
+                tower_id = link[role]
+                del tower_refs[tower_id][i, j, role]
+                if tower_refs[tower_id]:
+                    grph.nodes[tower_id]['elevation'] = tower_refs[tower_id][min(tower_refs[tower_id])]
+                else:
+                    grph.remove_node(tower_id)
 
-    # NASDAQ
-    writer.write("createNode( 40.5843303 , -74.2434266 , 'orange', 8);\n")
+    starts = sorted(range(len(intervals)), key=lambda i: intervals[i][1])
+    ends = sorted(range(len(intervals)), key=lambda i: intervals[i][2])
+    next_start = 0
+    next_end = 0
+    for date in sorted(set(dates), key=lambda d: datetime.strptime(d, '%m_%d_%Y')):
+        rec_date = datetime.strptime(date, '%m_%d_%Y').date()
+        # Grants first: a license granted and ended within the same step is added, then removed
+        while next_start < len(starts) and intervals[starts[next_start]][1] <= rec_date:
+            add_license(starts[next_start])
+            next_start += 1
+        while next_end < len(ends) and intervals[ends[next_end]][2] <= rec_date:
+            remove_license(ends[next_end])
+            next_end += 1
+        yield date, grph
 
-    for node in G.nodes(data=True):
-        writer.write("createNode( "
-                     + str(node[1]["lat_deg"])
-                     + " ,  " + str(node[1]["long_deg"])
-                     + " , 'black', 2);\n")
 
-    for edge in G.edges(data=True):
-        print(edge)
-        writer.write("createEdge( "
-                     + str(nodes_by_id[edge[0]]["lat_deg"])
-                     + " , " + str(nodes_by_id[edge[0]]["long_deg"])
-                     + " , " + str(nodes_by_id[edge[1]]["lat_deg"])
-                     + " , " + str(nodes_by_id[edge[1]]["long_deg"])
-                     + " , 'red', 1.4);\n")
+def get_link_intervals():
+    """
+    Gets the date intervals during which each link of the network is licensed, with the validity
+    of find_valid_licenses(); links of both directions are the same link
+    :return: Dictionary of link ((lat, long), (lat, long)) in degrees -> list of (grant date, end date)
+    of the licenses with a path over the link
+    """
+    network = license_data.load_network(network_file)
+    link_intervals = {}
+    for license_id, grant_date, end_date in load_license_intervals():
+        for transmitter, receiver, frequencies, length in network.get_paths(license_id):
+            link = tuple(sorted(((transmitter.lat_deg, transmitter.long_deg), (receiver.lat_deg, receiver.long_deg))))
+            if link[0] != link[1]:
+                link_intervals.setdefault(link, []).append((grant_date, end_date))
+    return link_intervals
+
+
+def write_history(entity_links):
+    """
+    Writes the history visualization of several entities from RECONSTRUST_DATES[0] to RECONSTRUST_DATES[-1]
+    :param entity_links: List of (entity name, links from get_link_intervals())
+    :return: None; OUT_FILE_HISTORY_HTML is generated
+    """
+    os.makedirs(os.path.dirname(OUT_FILE_HISTORY_HTML), exist_ok=True)
+    writer = open(OUT_FILE_HISTORY_HTML, 'w')
+    with open(topFile, 'r') as fi:
+        writer.write(fi.read())
+    map_export.write_history_map_data(writer, entity_links,
+                                      datetime.strptime(RECONSTRUST_DATES[0], '%m_%d_%Y').date(),
+                                      datetime.strptime(RECONSTRUST_DATES[-1], '%m_%d_%Y').date(),
+                                      HISTORY_MAP_STYLE, data_centers=latency.DATA_CENTERS.values())
+    with open(bottomFile, 'r') as fb:
+        writer.write(fb.read())
+    writer.close()
+
+
+def visualize_graph(writer):
+    """
+    Generates HTML file for visualizing the MW network
+    :param writer: Writer for the HTML file
+    :return: None; the HTML file is generated
+    """
+    map_export.write_map_data(writer, G, MAP_STYLE, data_centers=latency.DATA_CENTERS.values(),
+                              merge_collinear=MERGE_COLLINEAR_LINKS)
 
 
 def visualize():
@@ -245,27 +337,51 @@ def visualize():
     writer.close()
 
 
-for entity in ENTITY_NAMES:
-    G = nx.DiGraph()
-    valid_licenses = []
-    nodes = {}
-    nodes_by_id = {}
-    global_node_counter = 0
-    edges = {}
-
-    corr_name = entity.replace(" ", "_").replace("/", "_").replace(".", "_").replace(",", "_").replace("&", "_")
-
-    # Input license and network files
-    license_file = OUTPUT_DIR + corr_name + "/2020_04/license_status_dates.txt"
-    network_file = OUTPUT_DIR + corr_name + "/2020_04/network.txt"
-
+def write_snapshot():
+    """
+    Writes the graph G reconstructed on RECONSTRUST_DATE and, with WRITE_DATE_HTML, its visualization
+    :return: None; the graph snapshot and HTML files are generated
+    """
+    global OUT_FILE_HTML
     directory = OUTPUT_DIR + corr_name + "/" + RECONSTRUST_DATE
     if not os.path.exists(directory):
         os.makedirs(directory)
     OUT_FILE_HTML = OUTPUT_DIR + corr_name + "/" + RECONSTRUST_DATE + "/viz_active.html"
-    OUT_FILE_GRAPH = OUTPUT_DIR + corr_name + "/" + RECONSTRUST_DATE + "/graph_active.yaml"
+    if WRITE_DATE_HTML:
+        visualize()
+    graph_snapshot.write_graph(G, directory, write_yaml=WRITE_YAML)
+
+
+if __name__ == "__main__":
+    entity_links = []
+    for entity in ENTITY_NAMES:
+        corr_name = license_data.get_corr_name(entity)
+
+        # Input license and network files
+        license_file = OUTPUT_DIR + corr_name + "/2020_04/license_status_dates.txt"
+        network_file = OUTPUT_DIR + corr_name + "/2020_04/network.txt"
+
+        if WRITE_HISTORY_HTML:
+            entity_links.append((corr_name, get_link_intervals()))
+
+        if INCREMENTAL_GRAPHS:
+            for RECONSTRUST_DATE, G in iter_graphs(RECONSTRUST_DATES):
+                print("Reconstruction date", datetime.strptime(RECONSTRUST_DATE, '%m_%d_%Y').date())
+                write_snapshot()
+            continue
+
+        valid_licenses_by_date = find_valid_licenses(RECONSTRUST_DATES)
+        for RECONSTRUST_DATE in RECONSTRUST_DATES:
+            print("Reconstruction date", datetime.strptime(RECONSTRUST_DATE, '%m_%d_%Y').date())
+            G = nx.DiGraph()
+            valid_licenses = valid_licenses_by_date[RECONSTRUST_DATE]
+            nodes = {}
+            nodes_by_id = {}
+            global_node_counter = 0
+            edges = {}
+
+            reconstruct_network()
+            write_snapshot()
 
-    find_valid_license()
-    reconstruct_network()
-    visualize()
-    nx.write_yaml(G, OUT_FILE_GRAPH)
+    if WRITE_HISTORY_HTML:
+        write_history(entity_links)
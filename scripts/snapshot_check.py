@@ -0,0 +1,91 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Checks that graphs survive a graph_snapshot.write_graph/read_graph round trip with all node and edge attributes,
+including the owners of corridor graph links (interned in the snapshot) and graphs whose links have no owners.
+Run as a script to perform the check; it exits with status 1 if any graph differs after the round trip
+"""
+
+import sys
+import tempfile
+import networkx as nx
+
+try:
+    from . import graph_snapshot
+except (ImportError, SystemError):
+    import graph_snapshot
+
+
+def build_check_graph(with_owners):
+    """
+    Builds a small directed graph with antiparallel links, shared and unshared owners and a link without frequencies
+    :param with_owners: Whether links carry owners
+    :return: Directed graph
+    """
+    grph = nx.DiGraph()
+    grph.add_node(1, lat_deg=41.7625, long_deg=-87.9536, elevation='205.1')
+    grph.add_node(2, lat_deg=41.3011, long_deg=-84.8752, elevation='244.8')
+    grph.add_node(3, lat_deg=40.7934, long_deg=-74.0451, elevation='3.0')
+    grph.add_edge(1, 2, frequency_list=[6123.1, 6256.5], length=260.4)
+    grph.add_edge(2, 1, frequency_list=[6123.1], length=260.4)
+    grph.add_edge(2, 3, frequency_list=[], length=912.8)
+    if with_owners:
+        grph[1][2]['owners'] = ['New Line Networks', 'Jefferson Microwave']
+        grph[2][1]['owners'] = ['Jefferson Microwave']
+        grph[2][3]['owners'] = []
+    return grph
+
+
+def graphs_equal(grph, other):
+    """
+    Compares two graphs with their node and edge attributes
+    :param grph: Directed graph
+    :param other: Directed graph
+    :return: True if the graphs have the same nodes, links and attributes
+    """
+    return dict(grph.nodes(data=True)) == dict(other.nodes(data=True)) and \
+        sorted(grph.edges(data=True)) == sorted(other.edges(data=True))
+
+
+def check_round_trip():
+    """
+    Writes the check graphs with and without owners, reads them back and compares them
+    :return: Number of graphs which differ after the round trip
+    """
+    differences = 0
+    for with_owners in [True, False]:
+        grph = build_check_graph(with_owners)
+        with tempfile.TemporaryDirectory() as directory:
+            graph_snapshot.write_graph(grph, directory)
+            other = graph_snapshot.read_graph(directory)
+        if not graphs_equal(grph, other):
+            print("Round trip differs", "with owners" if with_owners else "without owners")
+            differences += 1
+    return differences
+
+
+if __name__ == "__main__":
+    differences = check_round_trip()
+    print("Differences", differences)
+    if differences:
+        sys.exit(1)
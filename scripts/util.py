@@ -21,7 +21,9 @@
 # SOFTWARE.
 
 import math
+from datetime import date, timedelta
 import networkx as nx
+import numpy as np
 
 EARTH_RADIUS = 6371  # km
 
@@ -58,6 +60,40 @@ def get_decimal_coordinates(coord):  #
     return float(lat_dec), float(long_dec)
 
 
+def parse_date(text):
+    """
+    Parses a date in FCC format; much faster than datetime.strptime
+    :param text: Date in format mm/dd/yyyy
+    :return: Date
+    """
+    month, day, year = text.split("/")
+    return date(int(year), int(month), int(day))
+
+
+def get_date_range(start, end, months=0, days=0):
+    """
+    Generates a range of snapshot dates
+    :param start: First date in format mm_dd_yyyy; with a step in months, its day should exist in every month
+    :param end: Last date (inclusive) in format mm_dd_yyyy
+    :param months: Step in months
+    :param days: Step in days
+    :return: List of dates in format mm_dd_yyyy
+    """
+    if months <= 0 and days <= 0:
+        raise ValueError("Date range step must be positive")
+    first = parse_date(start.replace("_", "/"))
+    last = parse_date(end.replace("_", "/"))
+    dates = []
+    current = first
+    step = 0
+    while current <= last:
+        dates.append(current.strftime('%m_%d_%Y'))
+        step += 1
+        month_index = first.month - 1 + step * months
+        current = date(first.year + month_index // 12, month_index % 12 + 1, first.day) + timedelta(days=step * days)
+    return dates
+
+
 def compute_length_ground(node1, node2):
     """
     Computes the distance between two nodes
@@ -75,6 +111,47 @@ def compute_length_ground(node1, node2):
     return dist
 
 
+def compute_ecef(lat_rad, long_rad):
+    """
+    Computes Earth-centered coordinates of points, with the same axes as compute_length_ground
+    :param lat_rad: Array of latitudes in radians
+    :param long_rad: Array of longitudes in radians
+    :return: Array of shape (n, 3) of coordinates in km
+    """
+    lat_rad = np.asarray(lat_rad, dtype=np.float64)
+    long_rad = np.asarray(long_rad, dtype=np.float64)
+    return np.stack((EARTH_RADIUS * np.cos(lat_rad) * np.sin(long_rad),
+                     EARTH_RADIUS * np.sin(lat_rad),
+                     EARTH_RADIUS * np.cos(lat_rad) * np.cos(long_rad)), axis=-1)
+
+
+def compute_lengths_ground(xyz1, xyz2):
+    """
+    Computes the (chord) distances between many pairs of points at once, like compute_length_ground
+    :param xyz1: Array of shape (n, 3) of Earth-centered coordinates (km) of the first points
+    :param xyz2: Array of shape (n, 3) of Earth-centered coordinates (km) of the second points
+    :return: Array of n distances in km
+    """
+    diff = np.asarray(xyz2, dtype=np.float64) - np.asarray(xyz1, dtype=np.float64)
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def compute_lengths_great_circle(lat1_rad, long1_rad, lat2_rad, long2_rad):
+    """
+    Computes the great-circle distances between many pairs of points at once (haversine formula)
+    :param lat1_rad: Array of latitudes of the first points in radians
+    :param long1_rad: Array of longitudes of the first points in radians
+    :param lat2_rad: Array of latitudes of the second points in radians
+    :param long2_rad: Array of longitudes of the second points in radians
+    :return: Array of distances in km
+    """
+    lat1_rad = np.asarray(lat1_rad, dtype=np.float64)
+    lat2_rad = np.asarray(lat2_rad, dtype=np.float64)
+    h = (np.sin((lat2_rad - lat1_rad) / 2) ** 2
+         + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin((np.asarray(long2_rad) - np.asarray(long1_rad)) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
 def generate_undirected_graph(grph):
     """
     Generates undirected graph for the entity
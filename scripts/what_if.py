@@ -0,0 +1,360 @@
+# MIT License
+#
+# Copyright (c) 2020 Debopam Bhattacherjee
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Evaluates how tower outages, link failures and proposed links or towers change the minimum stretch
+path between two data centers of an entity network, with the model of get_e2e_latency
+(find_inter_DC_min_lat). Shortest path trees from both data centers are computed once; a scenario
+which leaves the optimal path intact is answered from them directly, a single added link between
+existing towers in constant time, and other scenarios by an A* search guided by the precomputed
+distances to the destination (exact lower bounds when links are only removed) and by straight-line
+distances to the towers of added links
+"""
+
+import heapq
+import math
+import time
+
+try:
+    from . import util
+    from . import graph_snapshot
+    from . import latency
+    from . import license_data
+except (ImportError, SystemError):
+    import util
+    import graph_snapshot
+    import latency
+    import license_data
+
+# Output data directory
+OUTPUT_DIR = "../output_entity_wise/"
+
+# Entity and date of the network evaluated when run as a script; Format: mm_dd_yyyy
+ENTITY = "New Line Networks"
+SNAPSHOT_DATE = "04_01_2020"
+
+# Data centers (names in latency.DATA_CENTERS) between which latencies are evaluated
+SRC_DC = "cme"
+DST_DC = "ny4"
+
+# Virtual node attached to the towers near the destination data center
+SUPER_DESTINATION = "super_destination"
+
+# Number of scenarios reported when run as a script
+TOP_SCENARIOS = 10
+
+
+class Scenario:
+    """
+    Changes to a network: towers and links taken out, and proposed towers and links. Proposed towers
+    within the nearby radius of a data center get a fiber connection to it. Proposed links without a
+    length get the ground distance between their towers
+    """
+    __slots__ = ("removed_towers", "removed_links", "added_towers", "added_links")
+
+    def __init__(self, removed_towers=(), removed_links=(), added_towers=None, added_links=()):
+        """
+        :param removed_towers: Node IDs of the towers taken out
+        :param removed_links: (node ID, node ID) of the links taken out, in any direction
+        :param added_towers: Dictionary of new node ID -> (latitude, longitude) in degrees
+        :param added_links: (node ID, node ID) or (node ID, node ID, length (km)) of the proposed links
+        """
+        self.removed_towers = removed_towers
+        self.removed_links = removed_links
+        self.added_towers = added_towers if added_towers is not None else {}
+        self.added_links = added_links
+
+
+def _dijkstra(adj, root):
+    """
+    Computes a shortest path tree
+    :param adj: Dictionary of node -> dictionary of neighbor -> length
+    :param root: Root node
+    :return: Dictionary of node -> predecessor (None for the root), dictionary of node -> distance
+    """
+    preds = {root: None}
+    dists = {root: 0}
+    done = set()
+    heap = [(0, 0, root)]
+    counter = 1
+    while heap:
+        dist, c, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        for v, length in adj[u].items():
+            if dist + length < dists.get(v, math.inf):
+                dists[v] = dist + length
+                preds[v] = u
+                heapq.heappush(heap, (dists[v], counter, v))
+                counter += 1
+    return preds, dists
+
+
+class LatencyWhatIf:
+    """
+    Minimum stretch path between two data centers of a network under scenarios. A virtual source and a
+    virtual destination node are attached to the towers near the data centers, with fiber distances
+    scaled by latency.get_fiber_factor(), and the hop delay is folded into the link weights, as in
+    latency.find_min_stretch_paths
+    """
+
+    def __init__(self, grph, src_dc, dst_dc, radius=latency.NEARBY_RADIUS, hop_delay=None):
+        """
+        :param grph: Graph with 'lat_deg'/'long_deg' node and 'length' edge attributes; links are undirected
+        :param src_dc: Source data center (dictionary with lat/long in degrees and radians)
+        :param dst_dc: Destination data center
+        :param radius: Radius (km) within which towers are connected to the data centers with fiber
+        :param hop_delay: Delay (microseconds) of every link; latency.HOP_DELAY if None
+        """
+        self.radius = radius
+        self.hop_delay = latency.HOP_DELAY if hop_delay is None else hop_delay
+        self.hop_length = latency.get_hop_length(self.hop_delay)
+        self.fiber_factor = latency.get_fiber_factor()
+        self.geo_dist_dc = util.compute_length_ground(src_dc, dst_dc)
+        self.dc_xyz = util.compute_ecef([src_dc["lat_rad"], dst_dc["lat_rad"]],
+                                        [src_dc["long_rad"], dst_dc["long_rad"]]).tolist()
+        nodes = list(grph.nodes)
+        xyz = util.compute_ecef([math.radians(float(grph.nodes[u]['lat_deg'])) for u in nodes],
+                                [math.radians(float(grph.nodes[u]['long_deg'])) for u in nodes])
+        self.xyz = dict(zip(nodes, xyz.tolist()))
+        self.adj = {u: {} for u in nodes}
+        for u, v, length in grph.edges(data='length'):
+            if u != v:
+                self.adj[u][v] = length + self.hop_length
+                self.adj[v][u] = length + self.hop_length
+        # Fiber distances (km) of the towers near the data centers
+        nearby_towers, tower_dists = latency.find_nearby_towers(grph, {0: src_dc, 1: dst_dc}, radius)
+        self.src_fiber = {}
+        self.dst_fiber = {}
+        self.adj[latency.SUPER_SOURCE] = {}
+        self.adj[SUPER_DESTINATION] = {}
+        for (u, data), dist in zip(nearby_towers[0], tower_dists[0]):
+            self.src_fiber[u] = dist
+            self.adj[latency.SUPER_SOURCE][u] = self.adj[u][latency.SUPER_SOURCE] = \
+                dist * self.fiber_factor
+        for (u, data), dist in zip(nearby_towers[1], tower_dists[1]):
+            self.dst_fiber[u] = dist
+            self.adj[SUPER_DESTINATION][u] = self.adj[u][SUPER_DESTINATION] = \
+                dist * self.fiber_factor
+        self.src_preds, self.src_dists = _dijkstra(self.adj, latency.SUPER_SOURCE)
+        self.dst_preds, self.dst_dists = _dijkstra(self.adj, SUPER_DESTINATION)
+        self.base_result = None
+        self.base_nodes = set()
+        self.base_links = set()
+        if SUPER_DESTINATION in self.src_dists:
+            path = self._tree_path(self.src_preds, SUPER_DESTINATION)[::-1]
+            self.base_result = self._get_result(path, [self.adj[path[i]][path[i + 1]] for i in range(len(path) - 1)],
+                                                self.src_fiber, self.dst_fiber)
+            self.base_nodes = set(path[1:-1])
+            for i in range(1, len(path) - 2):
+                self.base_links.add((path[i], path[i + 1]))
+                self.base_links.add((path[i + 1], path[i]))
+
+    @staticmethod
+    def _tree_path(preds, node):
+        # Path from a node to the root of a shortest path tree
+        path = [node]
+        while preds[path[-1]] is not None:
+            path.append(preds[path[-1]])
+        return path
+
+    def _get_result(self, path, lengths, src_fiber, dst_fiber):
+        """
+        Gets the metrics of a path between the virtual nodes
+        :param path: Path including the virtual nodes
+        :param lengths: Weights of the edges of the path
+        :param src_fiber: Dictionary of node ID -> fiber distance (km) to the source data center
+        :param dst_fiber: Dictionary of node ID -> fiber distance (km) to the destination data center
+        :return: Towers of the path, path length (km), fiber distance (km), aggregate stretch,
+        latency (microseconds)
+        """
+        towers = path[1:-1]
+        hop_count = len(towers) - 1
+        path_length = sum(lengths[1:-1]) - hop_count * self.hop_length
+        dist_fiber = src_fiber[towers[0]] + dst_fiber[towers[-1]]
+        latency_us = latency.compute_latency(dist_fiber, path_length, hop_count, self.hop_delay)
+        return towers, path_length, dist_fiber, latency.compute_stretch(latency_us, self.geo_dist_dc), latency_us
+
+    def evaluate(self, scenario):
+        """
+        Gets the minimum stretch path under a scenario
+        :param scenario: Scenario
+        :return: Towers of the path, path length (km), fiber distance (km), aggregate stretch, latency (microseconds);
+        None if the data centers are not connected
+        """
+        removed_towers = set(scenario.removed_towers)
+        removed_links = set()
+        for link in scenario.removed_links:
+            removed_links.add((link[0], link[1]))
+            removed_links.add((link[1], link[0]))
+        if not scenario.added_links and not scenario.added_towers:
+            if removed_towers.isdisjoint(self.base_nodes) and removed_links.isdisjoint(self.base_links):
+                return self.base_result
+            return self._search(removed_towers, removed_links, {}, {}, self.src_fiber, self.dst_fiber)
+        # Proposed towers, with fiber to the data centers within the radius, and links
+        xyz = {}
+        for u, (lat_deg, long_deg) in scenario.added_towers.items():
+            xyz[u] = util.compute_ecef(math.radians(lat_deg), math.radians(long_deg)).tolist()
+        src_fiber = dict(self.src_fiber)
+        dst_fiber = dict(self.dst_fiber)
+        extra = {}
+
+        def add(u, v, length):
+            if length < extra.get(u, {}).get(v, math.inf):
+                extra.setdefault(u, {})[v] = length
+                extra.setdefault(v, {})[u] = length
+
+        for u in xyz:
+            if u in removed_towers:
+                continue
+            for fiber, virtual_node, dc_xyz in ((src_fiber, latency.SUPER_SOURCE, self.dc_xyz[0]),
+                                                (dst_fiber, SUPER_DESTINATION, self.dc_xyz[1])):
+                dist = math.dist(xyz[u], dc_xyz)
+                if dist < self.radius:
+                    fiber[u] = dist
+                    add(u, virtual_node, dist * self.fiber_factor)
+        for link in scenario.added_links:
+            u, v = link[0], link[1]
+            if u == v or u in removed_towers or v in removed_towers:
+                continue
+            length = link[2] if len(link) > 2 else math.dist(xyz.get(u) or self.xyz[u], xyz.get(v) or self.xyz[v])
+            add(u, v, length + self.hop_length)
+        # A single link between existing towers: the best path through it joins the two trees
+        if len(extra) == 2 and not xyz and not removed_towers and not removed_links:
+            u, v = list(extra)
+            total, a, b = min((self.src_dists.get(a, math.inf) + extra[a][b] + self.dst_dists.get(b, math.inf), a, b)
+                              for a, b in ((u, v), (v, u)))
+            if total >= self.src_dists.get(SUPER_DESTINATION, math.inf):
+                return self.base_result
+            src_path = self._tree_path(self.src_preds, a)[::-1]
+            dst_path = self._tree_path(self.dst_preds, b)
+            lengths = ([self.adj[src_path[i]][src_path[i + 1]] for i in range(len(src_path) - 1)] + [extra[a][b]]
+                       + [self.adj[dst_path[i]][dst_path[i + 1]] for i in range(len(dst_path) - 1)])
+            return self._get_result(src_path + dst_path, lengths, src_fiber, dst_fiber)
+        return self._search(removed_towers, removed_links, extra, xyz, src_fiber, dst_fiber)
+
+    def _search(self, removed_towers, removed_links, extra, xyz, src_fiber, dst_fiber):
+        """
+        Finds the shortest path between the virtual nodes by A* search. A path avoiding the added links
+        is at least as long as in the unchanged network, and a path using them first reaches one of
+        their towers, so the smaller of the distance to the destination in the unchanged network and
+        the straight-line distance to the nearest tower of an added link is a consistent estimate
+        :param removed_towers: Set of removed node IDs
+        :param removed_links: Set of removed (node ID, node ID), in both directions
+        :param extra: Dictionary of node ID -> dictionary of neighbor node ID -> length of added links
+        :param xyz: Dictionary of added node ID -> Earth-centered coordinates
+        :param src_fiber: Dictionary of node ID -> fiber distance (km) to the source data center
+        :param dst_fiber: Dictionary of node ID -> fiber distance (km) to the destination data center
+        :return: Result as in evaluate(), or None
+        """
+        endpoints = [xyz.get(u) or self.xyz[u] for u in extra if u not in (latency.SUPER_SOURCE, SUPER_DESTINATION)]
+
+        def estimate(u):
+            h = self.dst_dists.get(u, math.inf)
+            p = xyz.get(u) or self.xyz.get(u)
+            if p is None:
+                # Virtual nodes
+                return 0 if endpoints or u == SUPER_DESTINATION else h
+            for q in endpoints:
+                h = min(h, math.dist(p, q))
+            return h
+
+        dists = {latency.SUPER_SOURCE: 0}
+        preds = {latency.SUPER_SOURCE: None}
+        done = set()
+        heap = [(estimate(latency.SUPER_SOURCE), 0, latency.SUPER_SOURCE)]
+        counter = 1
+        while heap:
+            f, c, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            if u == SUPER_DESTINATION:
+                path = [u]
+                lengths = []
+                while preds[path[-1]] is not None:
+                    lengths.append(preds[path[-1]][1])
+                    path.append(preds[path[-1]][0])
+                return self._get_result(path[::-1], lengths[::-1], src_fiber, dst_fiber)
+            done.add(u)
+            for neighbors in (self.adj.get(u, {}), extra.get(u, {})):
+                for v, length in neighbors.items():
+                    if v in done or v in removed_towers or (u, v) in removed_links:
+                        continue
+                    dist = dists[u] + length
+                    if dist < dists.get(v, math.inf):
+                        h = estimate(v)
+                        if h == math.inf:
+                            continue
+                        dists[v] = dist
+                        preds[v] = (u, length)
+                        heapq.heappush(heap, (dist + h, counter, v))
+                        counter += 1
+        return None
+
+    def evaluate_batch(self, scenarios):
+        """
+        Evaluates scenarios
+        :param scenarios: List of Scenario
+        :return: List of results as in evaluate()
+        """
+        return [self.evaluate(scenario) for scenario in scenarios]
+
+
+def get_outage_scenarios(grph):
+    """
+    Gets the scenarios of single tower and single link outages of a network
+    :param grph: Graph
+    :return: List of (description, Scenario)
+    """
+    scenarios = []
+    for u in grph.nodes:
+        scenarios.append(("tower " + str(u), Scenario(removed_towers=[u])))
+    for u, v in grph.to_undirected().edges:
+        scenarios.append(("link " + str(u) + "-" + str(v), Scenario(removed_links=[(u, v)])))
+    return scenarios
+
+
+if __name__ == "__main__":
+    corr_name = license_data.get_corr_name(ENTITY)
+    G = graph_snapshot.read_graph(OUTPUT_DIR + corr_name + "/" + SNAPSHOT_DATE)
+    DC = latency.get_data_centers([SRC_DC, DST_DC])
+    start = time.time()
+    what_if = LatencyWhatIf(G, DC[0], DC[1])
+    print("Setup", "%.3f s" % (time.time() - start))
+    if what_if.base_result is None:
+        print("No path", corr_name, SNAPSHOT_DATE)
+    else:
+        towers, path_length, dist_fiber, stretch_aggr, latency_us = what_if.base_result
+        print(corr_name, SNAPSHOT_DATE, "path length", path_length, "fiber", dist_fiber,
+              "stretch", stretch_aggr, "latency (us)", latency_us)
+        scenarios = get_outage_scenarios(G)
+        start = time.time()
+        results = what_if.evaluate_batch([scenario for description, scenario in scenarios])
+        elapsed = time.time() - start
+        print("Scenarios", len(scenarios), "%.3f s" % elapsed, "%.0f scenarios/s" % (len(scenarios) / elapsed))
+        impacts = []
+        for (description, scenario), result in zip(scenarios, results):
+            impacts.append((math.inf if result is None else result[4] - latency_us, description))
+        impacts.sort(reverse=True)
+        for extra_latency_us, description in impacts[:TOP_SCENARIOS]:
+            print(description, "extra latency (us)", extra_latency_us)